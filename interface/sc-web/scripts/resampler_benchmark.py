@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Measures real-time factor (processing time / audio duration) of apiai.Resampler
+
+    python3 scripts/resampler_benchmark.py --seconds 60 --chunk 4096 --rates 8000 44100 48000
+"""
+
+import argparse
+import sys
+import time
+from os.path import abspath, dirname, join
+
+import numpy as np
+
+sys.path.insert(0, join(dirname(abspath(__file__)), "../server"))
+
+from apiai import Resampler  # noqa: E402
+
+
+def make_audio(rate: int, seconds: float) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    noise = np.random.default_rng(0).standard_normal(len(t)) * 500
+    return (np.sin(2 * np.pi * 440 * t) * 8000 + noise).astype(np.int16)
+
+
+def measure(rate: int, seconds: float, chunk: int) -> float:
+    audio = make_audio(rate, seconds)
+    data = memoryview(audio.tobytes())
+    resampler = Resampler(rate)
+    chunk_bytes = chunk * audio.itemsize
+
+    start = time.perf_counter()
+    for offset in range(0, len(data), chunk_bytes):
+        resampler.resample(data[offset:offset + chunk_bytes])
+    resampler.flush()
+    return (time.perf_counter() - start) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60.0, help="duration of the audio")
+    parser.add_argument("--chunk", type=int, default=4096, help="samples per chunk")
+    parser.add_argument("--rates", type=int, nargs="+", default=[8000, 22050, 44100, 48000],
+                        help="source sample rates")
+    args = parser.parse_args()
+
+    print(f"{'rate':>8} {'RTF':>10} {'streams per core':>18}")
+    for rate in args.rates:
+        rtf = measure(rate, args.seconds, args.chunk)
+        print(f"{rate:>8} {rtf:>10.5f} {1 / rtf:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
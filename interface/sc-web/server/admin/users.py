@@ -7,6 +7,7 @@ import tornado
 import db
 import decorators
 import handlers.base as base
+from handlers.user_cache import user_cache
 
 
 @decorators.class_logging
@@ -54,6 +55,7 @@ class UserSetRights(base.BaseHandler):
 
         u.role = new_rights
         database.update_user(u)
+        user_cache.invalidate(email=u.email)
 
         self.finish(json.dumps(
             {'id': u.id,
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 
-import math
 import numpy as np
 import decorators
 
+INT16_MAX = float(np.iinfo(np.int16).max)
+
 
 @decorators.class_logging
 class VAD(object):
@@ -12,7 +13,11 @@ class VAD(object):
         super(VAD, self).__init__()
 
         self.sampleRate = sampleRate
-        
+
+        # buffers reused by processFrames, they grow with the largest block seen
+        self._samples = np.empty(0, dtype=np.float32)
+        self._energies = np.empty(0, dtype=np.float64)
+
         self.reset()
 
     def reset(self):
@@ -39,20 +44,45 @@ class VAD(object):
         self.delta = 1.01
 
     def energy(self, frame):
-        result = 0.0
-
-        for value in frame:
-            result += value * value
-
-        return math.sqrt(result / float(len(frame))) 
+        frame = np.asarray(frame, dtype=np.float32)
+        return float(np.sqrt(np.dot(frame, frame) / float(len(frame))))
+
+    def energies(self, frames):
+        """RMS of every frame of a (frames count x frame size) block of int16 samples
+        """
+        frames = np.asarray(frames)
+        count, size = frames.shape
+        if self._samples.size < count * size:
+            self._samples = np.empty(count * size, dtype=np.float32)
+        if self._energies.size < count:
+            self._energies = np.empty(count, dtype=np.float64)
+
+        samples = self._samples[:count * size].reshape(count, size)
+        np.divide(frames, INT16_MAX, out=samples, casting='unsafe')
+        energies = self._energies[:count]
+        np.einsum('ij,ij->i', samples, samples, out=energies, dtype=np.float64)
+        energies /= float(size)
+        return np.sqrt(energies, out=energies)
+
+    def processFrames(self, frames, frameSize=None):
+        """Speech states (1 - speech or waiting for it, 0 - silence) of a block of frames
+
+        `frames` is either a (frames count x frame size) array or flat int16
+        samples of whole frames of `frameSize`.
+        """
+        frames = np.asarray(frames)
+        if frames.ndim == 1:
+            frames = frames.reshape(-1, frameSize or len(frames))
+        states = np.empty(len(frames), dtype=np.int8)
+        for i, energy in enumerate(self.energies(frames).tolist()):
+            states[i] = self._processEnergy(energy)
+        return states
 
     def processFrame(self, frame_input):
-        state = 0
+        return int(self.processFrames(np.asarray(frame_input).reshape(1, -1))[0])
 
-        frame = np.array(frame_input).astype(np.float32)
-        frame = frame / float(np.iinfo(np.int16).max)
-
-        energy = self.energy(frame)
+    def _processEnergy(self, energy):
+        state = 0
 
         if self.isFirst:
             self.isFirst = False
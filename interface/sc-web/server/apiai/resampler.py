@@ -1,29 +1,115 @@
 # -*- coding: utf-8 -*-
 
+from fractions import Fraction
+
 import numpy as np
 import decorators
 
 
 @decorators.class_logging
 class Resampler(object):
-    """docstring for Resapler"""
+    """Streaming polyphase resampler of mono samples, keeps its state between chunks
+
+    The source rate is converted by the rational factor up / down with a
+    Kaiser windowed sinc low-pass filter, that is split into `up` phases
+    once. Output is aligned with input, the filter delay is compensated
+    and the last samples are returned by flush().
+    """
+    ZERO_CROSSINGS = 16
+    KAISER_BETA = 8.0
+
     def __init__(self, source_samplerate, destination_samplerate=16000, dtype=np.int16, channels=1):
         super(Resampler, self).__init__()
         self.ratio = destination_samplerate / float(source_samplerate)
         self.dtype = dtype
         self.channels = channels
 
-    def resample(self, frame, frame_count):
+        factor = Fraction(int(destination_samplerate), int(source_samplerate))
+        self.up, self.down = factor.numerator, factor.denominator
+        self.phases = self._design_phases(self.up, self.down)
+        self.taps = self.phases.shape[1]
+        self.limits = np.iinfo(dtype) if np.issubdtype(dtype, np.integer) else None
+
+        self.reset()
+
+    def _design_phases(self, up, down):
+        # prototype low-pass at the up-sampled rate, cut at the lower of both Nyquist frequencies
+        rate = max(up, down)
+        taps = 2 * self.ZERO_CROSSINGS * rate + 1
+        n = np.arange(taps) - self.ZERO_CROSSINGS * rate
+        h = np.sinc(n / rate) * np.kaiser(taps, self.KAISER_BETA)
+        h *= up / h.sum()
+        # zeros at the end make the phases equally long and keep the delay
+        h = np.append(h, np.zeros(-taps % up))
+        # phase p applies h[p], h[p + up], ... to the newest, previous, ... input samples,
+        # reversed to be applied to windows of input in their order
+        return np.ascontiguousarray(h.reshape(-1, up).T[:, ::-1])
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1)
+        self._buffer = np.zeros(0)
+        # up-sampled position of the next output sample relative to the next input sample,
+        # starts at the filter delay to align output with input
+        self._position = self.ZERO_CROSSINGS * max(self.up, self.down)
+        self._inputs = 0
+        self._outputs = 0
+
+    def resample(self, frame, frame_count=None, as_list=False):
+        """Resamples the next chunk of the stream
+
+        `frame` is anything with the buffer interface (bytes, memoryview,
+        numpy array) of `dtype` samples, it is not copied. Returns array of
+        `dtype` samples or, if `as_list`, list of samples and their bytes.
+        """
+        samples = np.frombuffer(frame, dtype=self.dtype)
+        if frame_count is not None:
+            samples = samples[:frame_count * self.channels]
+        resampled = self._process(samples)
+        self._inputs += len(samples)
+        self._outputs += len(resampled)
+        if as_list:
+            return resampled.tolist(), resampled.tobytes()
+        return resampled
+
+    def flush(self, as_list=False):
+        """Returns the rest of the stream delayed by the filter and resets the resampler
+        """
+        expected = -(-self._inputs * self.up // self.down)
+        tail = np.zeros(self.taps)
+        resampled = self._process(tail)[:max(expected - self._outputs, 0)]
+        self.reset()
+        if as_list:
+            return resampled.tolist(), resampled.tobytes()
+        return resampled
 
-        nparray = np.fromstring(frame, dtype=self.dtype)
+    def _process(self, samples):
+        history = len(self._history)
+        count = len(samples)
+        length = history + count
+        if len(self._buffer) < length:
+            self._buffer = np.empty(length)
+        buffer = self._buffer[:length]
+        buffer[:history] = self._history
+        buffer[history:] = samples
 
-        scale = self.ratio
+        # output k is at up-sampled position t = position + k * down, it is
+        # the window of input ending at t // up filtered by phase t % up
+        available = count * self.up - self._position
+        outputs = max(-(-available // self.down), 0)
+        result = np.empty(outputs)
+        if outputs:
+            windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps)
+            # outputs of the same phase repeat every `up` outputs, `down` input samples apart
+            for first in range(min(self.up, outputs)):
+                t = self._position + first * self.down
+                phase, start = t % self.up, t // self.up
+                result[first::self.up] = windows[start::self.down][:len(range(first, outputs, self.up))] \
+                    @ self.phases[phase]
 
-        n = round(len(nparray) * scale)
-        resampled = np.interp(
-            np.linspace(0.0, 1.0, n, endpoint=False),
-            np.linspace(0.0, 1.0, len(nparray), endpoint=False),
-            nparray
-        )
+        self._position += outputs * self.down - count * self.up
+        self._history = buffer[length - history:].copy()
 
-        return resampled.tolist(), resampled.astype(self.dtype).tostring()
+        if self.limits is not None:
+            np.rint(result, out=result)
+            np.clip(result, self.limits.min, self.limits.max, out=result)
+        return result.astype(self.dtype)
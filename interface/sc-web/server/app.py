@@ -3,10 +3,14 @@
 import configparser
 import logging
 import signal
+import time
 from abc import ABC
+from typing import Optional
 
+import tornado.httpserver
 import tornado.ioloop
 import tornado.options
+import tornado.process
 import tornado.web
 from sc_client import client
 from sc_client.constants.exceptions import ServerError
@@ -17,12 +21,19 @@ import admin.users as admin_users
 import db
 import handlers.api as api
 import handlers.auth as auth
+import handlers.nl_client as nl_client
+import handlers.stats as stats
 import logger_sc
+import metrics
+import sc_executor
 import secret
 from handlers.main import MainHandler
+from handlers.identifier_cache import identifier_cache
+from handlers.menu_cache import menu_cache
+from handlers.tooltip_service import tooltip_service
 from handlers.nl import NaturalLanguageSearch
 from keynodes import KeynodeSysIdentifiers
-from scs_loader import load_scs_fragments
+from scs_loader import load_scs_fragments, wait_for_loaded_fragments
 
 from os.path import join, abspath, dirname
 
@@ -38,17 +49,37 @@ def parse_options():
                            type=str)
     tornado.options.define("event_wait_timeout", default=10, help="time to wait commands processing", type=int)
     tornado.options.define("action_result_wait_timeout", default=2, help="time to wait action result getting", type=int)
+    tornado.options.define("sc_workers", default=16, help="number of threads making blocking sc-client calls", type=int)
+    tornado.options.define("max_concurrent_requests", default=64,
+                           help="number of requests served at once, the rest wait for a free slot", type=int)
+    tornado.options.define("request_queue_timeout", default=10,
+                           help="time a request may wait for a free slot before 503 is returned", type=float)
+    tornado.options.define("tooltip_cache_size", default=4096, help="number of cached tooltips", type=int)
+    tornado.options.define("idtf_cache_size", default=8192, help="number of cached identifiers of each kind", type=int)
+    tornado.options.define("user_cache_ttl", default=30,
+                           help="seconds an authenticated user with its rights and roles is cached", type=int)
+    tornado.options.define("scs_batch_size", default=1 << 20,
+                           help="number of characters of scs-fragments uploaded to sc-server at once", type=int)
     tornado.options.define("idtf_search_limit", default=100,
                            help="number of maximum results for searching by identifier", type=int)
     tornado.options.define("host", default="localhost", help="host name", type=str)
     tornado.options.define("port", default=8000, help="host port", type=int)
     tornado.options.define("server_host", default="localhost", help="host name", type=str)
     tornado.options.define("server_port", default=8090, help="host port", type=int)
+    tornado.options.define("processes", default=1,
+                           help="number of server processes, each has its own connection to sc-server "
+                                "(0 - one per CPU). Caches are per process: sc-memory caches follow sc-events "
+                                "in every process, but a user changed in one process stays cached in the others "
+                                "for up to --user_cache_ttl seconds", type=int)
+    tornado.options.define("sc_healthcheck_interval", default=5.0,
+                           help="time period between sc-server connection checks in seconds", type=float)
     tornado.options.define("reconnect_retries", default=5, help="reconnect count to the server", type=int)
     tornado.options.define("reconnect_retry_delay", default=2.0,
                            help="time period between reconnects to the server in seconds",
                            type=float)
     tornado.options.define("public_url", default="ws://localhost:8090/ws_json", help="public server url", type=str)
+    tornado.options.define("metrics", default=False,
+                           help="record latency of instrumented methods and serve it on /metrics", type=bool)
     tornado.options.define("allowed_origins", default="", help="Sets 'access-control-allow-origin' header", type=str)
     tornado.options.define("auth_redirect_port", default=80, help="host port", type=int)
 
@@ -57,6 +88,13 @@ def parse_options():
 
     tornado.options.define("apiai_subscription_key", default="", help="subscription key for api.ai", type=str)
     tornado.options.define("apiai_client_access_token", default="", help="client access token for api.ai", type=str)
+    tornado.options.define("nl_backend", default="apiai", help="natural language backend: apiai or stub", type=str)
+    tornado.options.define("nl_stub_path", default="", help="JSON file with answers of the stub backend", type=str)
+    tornado.options.define("nl_timeout", default=5.0,
+                           help="timeout of a whole natural language query in seconds, retries included", type=float)
+    tornado.options.define("nl_connections", default=4, help="number of kept-alive connections to api.ai", type=int)
+    tornado.options.define("nl_cache_size", default=1024, help="number of cached natural language query results",
+                           type=int)
 
     tornado.options.define("user_key_expire_time", default=600, help="user key expire time in seconds", type=int)
     tornado.options.define("super_emails", default="", help="email of site super administrator (maximum rights)",
@@ -94,6 +132,8 @@ def init_app_rules():
 
         (r"/api/user/", api.User),
 
+        (r"/metrics$", stats.Metrics),
+
         (r"/auth/google$", auth.GoogleOAuth2LoginHandler),
         (r"/auth/logout$", auth.LogOut),
 
@@ -105,18 +145,55 @@ def init_app_rules():
 
 
 def post_reconnect_handler():
-    # load scs required for sc-web server
-    # TODO: don't load scs fragments if they already exist in sc-memory
-    try:
-        logger.info(f"Load sc-web kb model from: {REPO_FILE_PATH}")
-        load_scs_fragments(REPO_FILE_PATH)
-    except ServerError as e:
-        logger.error(e)
-        exit(1)
+    # load scs required for sc-web server, one process does it for all,
+    # fragments that are already in sc-memory are skipped
+    if tornado.process.task_id() in (None, 0):
+        try:
+            logger.info(f"Load sc-web kb model from: {REPO_FILE_PATH}")
+            load_scs_fragments(REPO_FILE_PATH, tornado.options.options.scs_batch_size)
+        except ServerError as e:
+            logger.error(e)
+            exit(1)
+    else:
+        # keynodes of the sc-web kb model are subscribed to, so they have to be loaded first
+        wait_for_loaded_fragments(keynode.value for keynode in KeynodeSysIdentifiers)
 
     logger.info("Resolve keynodes")
     ScKeynodes().resolve_identifiers([KeynodeSysIdentifiers])
 
+    menu_cache.subscribe()
+    tooltip_service.subscribe()
+    identifier_cache.subscribe()
+
+
+_disconnected_since: Optional[float] = None
+_connecting = False
+
+
+async def check_sc_connection(server_url: str):
+    """Reconnects to sc-server when the connection is lost and sc-client doesn't
+        reconnect itself, post_reconnect_handler runs after that as usual
+    """
+    global _disconnected_since, _connecting
+    if client.is_connected():
+        _disconnected_since = None
+        return
+    now = time.monotonic()
+    if _disconnected_since is None:
+        _disconnected_since = now
+    # sc-client retries first, connecting meanwhile would race with its reconnect
+    options = tornado.options.options
+    if _connecting or now - _disconnected_since < options.reconnect_retries * options.reconnect_retry_delay:
+        return
+
+    logger.warning("Connection with sc-server is lost, reconnecting")
+    _connecting = True
+    try:
+        await sc_executor.run(client.connect, server_url)
+    finally:
+        _connecting = False
+        _disconnected_since = None
+
 
 def on_error(e):
     logger.error(e)
@@ -128,6 +205,8 @@ def on_error(e):
 def on_shutdown():
     logger.info("Close connection with sc-server")
     client.disconnect()
+    sc_executor.shutdown()
+    nl_client.shutdown()
 
     logging.info('Stop application')
     tornado.ioloop.IOLoop.instance().stop()
@@ -149,10 +228,14 @@ def main(options):
     logger.info("Preparing database...")
     database = db.DataBase()
     database.init()
+    db.remove_session()
+    # forked server processes open their own connections
+    database.engine.dispose()
 
     # prepare logger
     logger.info("Preparing logger...")
     logger_sc.init()
+    metrics.enabled = options.metrics
 
     rules = init_app_rules()
     application = tornado.web.Application(
@@ -166,7 +249,15 @@ def main(options):
         public_url=options.public_url
     )
 
-    application.listen(options.port)
+    if options.processes != 1:
+        logger.warning(f"Users are cached per process, changes of a user reach other processes "
+                       f"after up to {options.user_cache_ttl} seconds")
+
+    # sc-client keeps one connection per process, so connections are spread by processes
+    server = tornado.httpserver.HTTPServer(application)
+    server.bind(options.port)
+    server.start(options.processes)
+
     server_url = f"ws://{options.server_host}:{options.server_port}/ws_json"
     client.set_error_handler(on_error)
     client.set_reconnect_handler(
@@ -177,6 +268,9 @@ def main(options):
     client.connect(server_url)
 
     app_instance = tornado.ioloop.IOLoop.instance()
+    tornado.ioloop.PeriodicCallback(
+        lambda: app_instance.spawn_callback(check_sc_connection, server_url),
+        options.sc_healthcheck_interval * 1000).start()
     signal.signal(signal.SIGINT, lambda sig, frame: app_instance.add_callback_from_signal(on_shutdown))
 
     web_url = f"http://{options.host}:{options.port}"
@@ -7,11 +7,37 @@ import uuid
 import tornado.options
 from sqlalchemy import Column, Integer, String
 from sqlalchemy import create_engine
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 Base = declarative_base()
 
+# one engine with a pool of connections per process, every thread works in its own session
+_engine = None
+Session = scoped_session(sessionmaker())
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            'sqlite:///' + tornado.options.options.db_path,
+            poolclass=QueuePool,
+            # a connection for the IOLoop and every executor thread, their sessions are removed after each task
+            pool_size=tornado.options.options.sc_workers + 1,
+            connect_args={'check_same_thread': False},
+        )
+        Session.configure(bind=_engine)
+    return _engine
+
+
+def remove_session():
+    """Closes the session of the current thread, its connection goes back to the pool
+    """
+    Session.remove()
+
 
 class Role(Base):
     __tablename__ = 'role'
@@ -37,11 +63,8 @@ class DataBase:
     RIGHTS_SUPER = 0xff
 
     def __init__(self):
-        self.engine = create_engine('sqlite:///' + tornado.options.options.db_path)
-        self.session = None
-
-    def __del__(self):
-        pass
+        self.engine = get_engine()
+        self.session = Session()
 
     def init(self):
         Base.metadata.create_all(self.engine)
@@ -53,20 +76,16 @@ class DataBase:
             self.RIGHTS_SUPER: 'super'
         }
 
-        for i in range(256):
-            n = None
-            try:
-                n = names[i]
-            except:
-                pass
-
-            role = Role(id=i, rights=i, name=n)
-            self._session().merge(role)
+        roles = [{'id': i, 'rights': i, 'name': names.get(i)} for i in range(256)]
+        statement = insert(Role).values(roles)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Role.id],
+            set_={'rights': statement.excluded.rights, 'name': statement.excluded.name},
+        )
+        self._session().execute(statement)
         self._session().commit()
 
     def _session(self):
-        if not self.session:
-            self.session = sessionmaker(bind=self.engine)()
         return self.session
 
     def create_user_key(self):
@@ -112,10 +131,12 @@ class DataBase:
         return key
 
     def paginate_users(self, start, count):
-        users = self._session().query(User).offset(start).limit(count).all()
+        users = self._session().query(User, Role) \
+            .join(Role, Role.id == User.role) \
+            .order_by(User.id) \
+            .offset(start).limit(count).all()
         res = []
-        for u in users:
-            r = self.get_user_role(u)
+        for u, r in users:
             res.append(
                 {'name': u.name,
                  'avatar': u.avatar,
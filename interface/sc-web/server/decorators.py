@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
+import inspect
 import logging
+import time
 
 import tornado.options
 import tornado.web
 from functools import wraps
 from typing import TypeVar, Callable
 
+import metrics
+
+logger = logging.getLogger()
+
 
 def requestAdmin(method):
     def wrapper(self, *args, **kwargs):
@@ -21,17 +27,45 @@ RT = TypeVar('RT')
 
 
 def method_logging(func: Callable[..., RT]) -> Callable[..., RT]:
+    """Logs calls of `func` at debug level and records their latency when metrics are enabled
+
+    With metrics disabled and debug logging off a call costs two flag checks.
+    """
+    code = func.__code__
+    stats = metrics.get_stats(f'{func.__module__}.{func.__qualname__}')
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("- call method %s in: %s line: %d", code.co_name, code.co_filename, code.co_firstlineno)
+            if not metrics.enabled:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                stats.record(time.perf_counter() - start)
+
+        return async_wrapper
+
     @wraps(func)
-    def wrapper(*argv):
-        logging.debug("- %s" % "call method " + func.__code__.co_name + " in: " +
-                      func.__code__.co_filename + " line: " + str(func.__code__.co_firstlineno))
-        return func(*argv)
+    def wrapper(*args, **kwargs):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("- call method %s in: %s line: %d", code.co_name, code.co_filename, code.co_firstlineno)
+        if not metrics.enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.record(time.perf_counter() - start)
 
     return wrapper
 
 
 def class_logging(cls):
-    for name, method in cls.__dict__.items():
-        if not name.startswith('_') and not type(method) is int:
+    for name, method in list(cls.__dict__.items()):
+        if not name.startswith('_') and inspect.isfunction(method):
             setattr(cls, name, method_logging(method))
     return cls
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from typing import List
+from typing import Dict, List
 import logging
 import os
 
@@ -9,16 +9,20 @@ import json
 
 from sc_client import client
 from sc_client.constants import sc_type
+from sc_client.constants.common import ScEventType
 from sc_client.models import ScTemplate, ScAddr, ScConstruction
 from sc_client.sc_keynodes import ScKeynodes
 
 import decorators
+import sc_events
+import sc_executor
 
 from keynodes import KeynodeSysIdentifiers
 
 from . import api_logic as logic
-import time
 from . import base
+from .menu_cache import menu_cache
+from .tooltip_service import tooltip_service
 
 # -------------------------------------------
 
@@ -26,14 +30,13 @@ logger = logging.getLogger()
 
 
 class ContextMenu(base.BaseHandler):
-    # @tornado.web.asynchronous
-    def get(self):
-        keynodes = ScKeynodes()
-        keynode_ui_main_menu = keynodes[KeynodeSysIdentifiers.ui_main_menu.value]
-
-        # try to find main menu node
-        cmds = []
-        logic.find_atomic_commands(keynode_ui_main_menu, cmds)
+    async def get(self):
+        # the menu is rebuilt only after it changes in sc-memory
+        etag, cmds, _ = await sc_executor.run(menu_cache.get)
+        self.set_header("Etag", f'"{etag}"')
+        if self.check_etag_header():
+            self.set_status(304)
+            return self.finish()
 
         logger.debug(f'Result: {cmds}')
         self.set_header("Content-Type", "application/json")
@@ -41,8 +44,7 @@ class ContextMenu(base.BaseHandler):
 
 
 class CmdDo(base.BaseHandler):
-    # @tornado.web.asynchronous
-    def post(self):
+    async def post(self):
         cmd_addr = ScAddr(int(self.get_argument(u'cmd', None)))
         # parse arguments
         first = True
@@ -52,16 +54,18 @@ class CmdDo(base.BaseHandler):
         while first or arg is not None:
             arg = self.get_argument(u'%d_' % idx, None)
             if arg is not None:
-                arg = ScAddr(int(arg))
-                # check if sc-element exist
-                if client.get_elements_types(arg)[0].is_valid():
-                    arguments.append(arg)
-                else:
-                    return logic.serialize_error(404, "Invalid argument: %s" % arg)
+                arguments.append(ScAddr(int(arg)))
             first = False
             idx += 1
 
-        result = logic.do_command(cmd_addr, arguments, self)
+        # check if sc-elements exist
+        if arguments:
+            types = await sc_executor.run(client.get_elements_types, *arguments)
+            for arg, arg_type in zip(arguments, types):
+                if not arg_type.is_valid():
+                    return logic.serialize_error(self, 404, "Invalid argument: %s" % arg)
+
+        result = await logic.do_command(cmd_addr, arguments, self)
         if result is not None:
             logger.debug(f'Result: {result}')
             self.set_header("Content-Type", "application/json")
@@ -69,11 +73,11 @@ class CmdDo(base.BaseHandler):
 
 
 class ActionResultTranslate(base.BaseHandler):
-    # @tornado.web.asynchronous
-    def post(self):
+    async def post(self):
         action_addr = ScAddr(int(self.get_argument(u'action', None)))
         format_addr = ScAddr(int(self.get_argument(u'format', None)))
 
+        lang_addr = None
         lang_arg = self.get_argument(u'lang', None)
         if lang_arg:
             lang_addr = ScAddr(int(lang_arg))
@@ -86,25 +90,14 @@ class ActionResultTranslate(base.BaseHandler):
         ui_command_initiated = keynodes[KeynodeSysIdentifiers.ui_command_initiated.value]
 
         # try to find result for the action
-        wait_time = 0
-        wait_dt = 0.1
-
-        result = logic.find_result(action_addr)
-        while not result:
-            time.sleep(wait_dt)
-            wait_time += wait_dt
-            if wait_time > tornado.options.options.event_wait_timeout:
-                return logic.serialize_error(self, 404, 'Timeout waiting for result')
-
-            result = logic.find_result(action_addr)
-
+        result = await logic.find_result(action_addr, tornado.options.options.event_wait_timeout)
         if not result:
-            return logic.serialize_error(self, 404, 'Result not found')
+            return logic.serialize_error(self, 404, 'Timeout waiting for result')
 
         result_addr = result[0].get(2)
 
         # try to find translation to specified format
-        result_link_addr = logic.find_translation_with_format(result_addr, format_addr)
+        result_link_addr = await sc_executor.run(logic.find_translation_with_format, result_addr, format_addr)
 
         # if link addr not found, then run translation of result to specified format
         result = {}
@@ -138,21 +131,23 @@ class ActionResultTranslate(base.BaseHandler):
                 sc_type.CONST_PERM_POS_ARC, ui_command_initiated, 'trans_cmd_addr', 'arc_addr_6')
             construction.generate_connector(sc_type.CONST_PERM_POS_ARC, keynode_system_element, 'arc_addr_6')
 
-            result = client.generate_elements(construction)
+            result = await sc_executor.run(client.generate_elements, construction)
 
             # now we need to wait translation result
-            wait_time = 0
-            translation = logic.find_translation_with_format(result_addr, format_addr)
-            while not translation.is_valid():
-                time.sleep(wait_dt)
-                wait_time += wait_dt
-                if wait_time > tornado.options.options.event_wait_timeout:
-                    return logic.serialize_error(self, 404, 'Timeout waiting for result translation')
+            watched = [
+                (keynodes[KeynodeSysIdentifiers.nrel_translation.value], ScEventType.AFTER_GENERATE_OUTGOING_ARC),
+                (format_addr, ScEventType.AFTER_GENERATE_INCOMING_ARC),
+            ]
+            def find_translation():
+                translation_addr = logic.find_translation_with_format(result_addr, format_addr)
+                return translation_addr if translation_addr.is_valid() else None
 
-                translation = logic.find_translation_with_format(result_addr, format_addr)
+            translation = await sc_events.wait_for(
+                find_translation, watched, tornado.options.options.event_wait_timeout)
+            if translation is None:
+                return logic.serialize_error(self, 404, 'Timeout waiting for result translation')
 
-            if translation is not None:
-                result_link_addr = translation
+            result_link_addr = translation
 
         # if result exists, then we need to return it content
         if result_link_addr is not None:
@@ -165,9 +160,8 @@ class ActionResultTranslate(base.BaseHandler):
 
 @decorators.class_logging
 class Languages(base.BaseHandler):
-    # @tornado.web.asynchronous
-    def get(self):
-        langs = logic.get_languages_list()
+    async def get(self):
+        langs = await sc_executor.run(logic.get_languages_list)
 
         logger.debug(f'Result: {langs}')
         self.set_header("Content-Type", "application/json")
@@ -176,20 +170,19 @@ class Languages(base.BaseHandler):
 
 @decorators.class_logging
 class LanguageSet(base.BaseHandler):
-    # @tornado.web.asynchronous
-    def post(self):
+    async def post(self):
         lang_addr = ScAddr(int(self.get_argument(u'lang_addr', None)))
 
-        sc_session = logic.ScSession(self)
-        sc_session.set_current_lang_mode(lang_addr)
+        sc_session = logic.ScSession.for_handler(self)
+        await sc_executor.run(sc_session.set_current_lang_mode, lang_addr)
+        sc_session.save(self)
 
         self.finish()
 
 
 @decorators.class_logging
 class InfoTooltip(base.BaseHandler):
-    # @tornado.web.asynchronous
-    def post(self):
+    async def post(self):
 
         # parse arguments
         first = True
@@ -204,26 +197,36 @@ class InfoTooltip(base.BaseHandler):
             first = False
             idx += 1
 
-            sc_session = logic.ScSession(self)
+        sc_session = logic.ScSession.for_handler(self)
+        result = await sc_executor.run(self.find_tooltips, sc_session, arguments)
+        sc_session.save(self)
 
-            result = {}
-            for addr in arguments:
-                tooltip = logic.find_tooltip(ScAddr(int(addr)), sc_session.get_used_language())
-                result[addr] = tooltip
+        logger.debug(f'Result: {result}')
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(result))
 
-            logger.debug(f'Result: {result}')
-            self.set_header("Content-Type", "application/json")
-            self.finish(json.dumps(result))
+    def find_tooltips(self, sc_session: logic.ScSession, arguments: List[str]) -> Dict[str, str]:
+        lang = sc_session.get_used_language()
+
+        tooltips = tooltip_service.get([ScAddr(int(addr)) for addr in arguments], lang)
+        return {addr: tooltips[ScAddr(int(addr))] for addr in arguments}
 
 
 @decorators.class_logging
 class User(base.BaseHandler):
     _keynodes = ScKeynodes()
 
-    # @tornado.web.asynchronous
-    def get(self):
+    async def get(self):
+        sc_session = logic.ScSession.for_handler(self)
+        result = await sc_executor.run(self.get_user_info, sc_session)
+        sc_session.save(self)
+
+        logger.debug(f'Result: {result}')
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(result))
+
+    def get_user_info(self, sc_session: logic.ScSession) -> Dict:
         # get user sc-addr
-        sc_session = logic.ScSession(self)
         user_addr = sc_session.get_sc_addr()
 
         if sc_session.email:
@@ -234,9 +237,11 @@ class User(base.BaseHandler):
         roles = []
 
         if is_authenticated:
-            user_kb_node = sc_session.get_user_kb_node_by_email()
-            if user_kb_node.is_valid():
-                roles = self.get_user_roles(user_kb_node)
+            user = sc_session.user
+            if user.kb_roles is None:
+                user_kb_node = sc_session.get_user_kb_node_by_email()
+                user.kb_roles = self.get_user_roles(user_kb_node) if user_kb_node.is_valid() else []
+            roles = user.kb_roles
 
         result = {
             'sc_addr': user_addr.value,
@@ -246,49 +251,26 @@ class User(base.BaseHandler):
             'email': sc_session.email,
             'roles': roles
         }
-
-        logger.debug(f'Result: {result}')
-        self.set_header("Content-Type", "application/json")
-        self.finish(json.dumps(result))
+        return result
 
     def get_user_roles(self, user_kb_node: ScAddr) -> List[str]:
         roles = [KeynodeSysIdentifiers.nrel_authorised_user.value]
 
-        manager_template = ScTemplate()
-        manager_template.quintuple(
-            sc_type.VAR_NODE,
-            sc_type.VAR_COMMON_ARC,
-            user_kb_node,
-            sc_type.VAR_PERM_POS_ARC,
-            self._keynodes[KeynodeSysIdentifiers.nrel_manager.value]
-        )
-        is_manager_role_exist = bool(client.search_by_template(manager_template))
-
-        admin_template = ScTemplate()
-        admin_template.quintuple(
+        RELATION_NODE = "_relation"
+        template = ScTemplate()
+        template.quintuple(
             sc_type.VAR_NODE,
             sc_type.VAR_COMMON_ARC,
             user_kb_node,
             sc_type.VAR_PERM_POS_ARC,
-            self._keynodes[KeynodeSysIdentifiers.nrel_administrator.value]
+            (sc_type.VAR_NODE, RELATION_NODE)
         )
-        is_admin_role_exist = bool(client.search_by_template(manager_template))
+        relations = {result.get(RELATION_NODE) for result in client.search_by_template(template)}
 
-        expert_template = ScTemplate()
-        expert_template.quintuple(
-            sc_type.VAR_NODE,
-            sc_type.VAR_COMMON_ARC,
-            user_kb_node,
-            sc_type.VAR_PERM_POS_ARC,
-            self._keynodes[KeynodeSysIdentifiers.nrel_expert.value]
-        )
-        is_expert_role_exist = bool(client.search_by_template(expert_template))
-
-        if is_admin_role_exist:
-            roles.append(KeynodeSysIdentifiers.nrel_administrator.value)
-        if is_manager_role_exist:
-            roles.append(KeynodeSysIdentifiers.nrel_manager.value)
-        if is_expert_role_exist:
-            roles.append(KeynodeSysIdentifiers.nrel_expert.value)
+        for role in (KeynodeSysIdentifiers.nrel_administrator,
+                     KeynodeSysIdentifiers.nrel_manager,
+                     KeynodeSysIdentifiers.nrel_expert):
+            if self._keynodes[role.value] in relations:
+                roles.append(role.value)
 
         return roles
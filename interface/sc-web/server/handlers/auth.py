@@ -12,8 +12,10 @@ from sc_client.models import ScTemplate, ScConstruction, ScLinkContent, ScLinkCo
 from sc_client.sc_keynodes import ScKeynodes
 
 from . import base
+from .user_cache import user_cache
 import db
 import decorators
+import sc_executor
 
 from keynodes import KeynodeSysIdentifiers
 
@@ -43,6 +45,7 @@ class GoogleOAuth2LoginHandler(base.BaseHandler, tornado.auth.GoogleOAuth2Mixin)
             u.key = key
             logger.info(f'User key: {key}')
             database.update_user(u)
+            user_cache.invalidate(email=email)
         else:
             logger.warning('User is not found by email')
             role = 0
@@ -181,8 +184,7 @@ class GoogleOAuth2LoginHandler(base.BaseHandler, tornado.auth.GoogleOAuth2Mixin)
         )
         client.generate_elements(construction)
 
-    @tornado.gen.coroutine
-    def get(self):
+    async def get(self):
         self.settings[self._OAUTH_SETTINGS_KEY]['key'] = tornado.options.options.google_client_id
         self.settings[self._OAUTH_SETTINGS_KEY]['secret'] = tornado.options.options.google_client_secret
 
@@ -192,7 +194,7 @@ class GoogleOAuth2LoginHandler(base.BaseHandler, tornado.auth.GoogleOAuth2Mixin)
         logger.debug(f'URI: {uri}')
 
         if self.get_argument('code', False):
-            user = yield self.get_authenticated_user(
+            user = await self.get_authenticated_user(
                 redirect_uri=uri,
                 code=self.get_argument('code'))
 
@@ -203,7 +205,7 @@ class GoogleOAuth2LoginHandler(base.BaseHandler, tornado.auth.GoogleOAuth2Mixin)
 
             access_token = str(user['access_token'])
             http_client = self.get_auth_http_client()
-            response = yield http_client.fetch(
+            response = await http_client.fetch(
                 'https://www.googleapis.com/oauth2/v1/userinfo?access_token=' + access_token)
 
             if not response:
@@ -211,12 +213,12 @@ class GoogleOAuth2LoginHandler(base.BaseHandler, tornado.auth.GoogleOAuth2Mixin)
                 raise tornado.web.HTTPError(500, 'Google authentication failed')
             user = json.loads(response.body)
 
-            self._loggedin(user)
+            await sc_executor.run(self._loggedin, user)
 
             self.redirect('/')
 
         else:
-            yield self.authorize_redirect(
+            self.authorize_redirect(
                 redirect_uri=uri,
                 client_id=self.settings['google_oauth']['key'],
                 scope=['profile', 'email'],
@@ -226,16 +228,17 @@ class GoogleOAuth2LoginHandler(base.BaseHandler, tornado.auth.GoogleOAuth2Mixin)
 
 @decorators.class_logging
 class LogOut(base.BaseHandler):
-    def get(self):
-        self.logout_user_from_kb()
+    async def get(self):
+        await sc_executor.run(self.logout_user_from_kb, logic.ScSession.for_handler(self))
+        if self.current_user is not None:
+            user_cache.invalidate(email=self.current_user.email)
         logger.info('Clearing cookies...')
         self.clear_cookie(self.cookie_user_key)
         self.redirect('/')
 
-    def logout_user_from_kb(self):
+    def logout_user_from_kb(self, sc_session: logic.ScSession):
         logger.info('Logout from kb')
         keys = ScKeynodes()
-        sc_session = logic.ScSession(self, keys)
         links = client.search_links_by_contents(sc_session.email)[0]
         if links and len(links) == 1:
             USER_NODE = "_user"
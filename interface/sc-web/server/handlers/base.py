@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
-from typing import Optional, Awaitable
+from typing import List, Optional, Awaitable
 
 from tornado import web, options
 import db
 import decorators
+import sc_executor
+from .user_cache import user_cache
 
 
 @decorators.class_logging
@@ -13,6 +15,8 @@ class User:
         self.name = u.name
         self.avatar = u.avatar
         self.rights = database.get_user_role(u).rights
+        # roles in the knowledge base, filled in by the first request that needs them
+        self.kb_roles: Optional[List[str]] = None
     
     def can_admin(self):
         return self.rights >= db.DataBase.RIGHTS_ADMIN
@@ -23,6 +27,26 @@ class User:
 
 
 class BaseHandler(web.RequestHandler):
+    _has_request_slot = False
+
+    async def prepare(self):
+        # limits requests served at once, the rest wait for a free slot
+        await sc_executor.acquire_request_slot()
+        self._has_request_slot = True
+        # the user is known before anything is dispatched to sc_executor threads,
+        # they get it from the handler methods called here on the IOLoop
+        key = self._get_user_key()
+        user = user_cache.get(key) if key else None
+        if key and user is None:
+            user = await sc_executor.run(self._find_user, key)
+        self.current_user = user
+
+    def on_finish(self):
+        db.remove_session()
+        if self._has_request_slot:
+            self._has_request_slot = False
+            sc_executor.release_request_slot()
+
     # CORS headers
     def set_default_headers(self):
         self.set_header("Access-Control-Allow-Origin", options.options.allowed_origins)
@@ -41,16 +65,28 @@ class BaseHandler(web.RequestHandler):
     cookie_user_key = 'user_key'
     
     def get_current_user(self) -> Optional[User]:
-        key = self.get_secure_cookie(self.cookie_user_key, max_age_days=1)
+        key = self._get_user_key()
         if not key:
             return None
-        key = key.decode('UTF-8')
-        
+
+        user = user_cache.get(key)
+        if user is not None:
+            return user
+        return self._find_user(key)
+
+    def _get_user_key(self) -> Optional[str]:
+        key = self.get_secure_cookie(self.cookie_user_key, max_age_days=1)
+        return key.decode('UTF-8') if key else None
+
+    @staticmethod
+    def _find_user(key: str) -> Optional[User]:
         database = db.DataBase()
         u = database.get_user_by_key(key)
-        if u:           
-            return User(u, database)
-        
+        if u:
+            user = User(u, database)
+            user_cache.put(key, user)
+            return user
+
         return None
 
     def get_user_id(self, email):
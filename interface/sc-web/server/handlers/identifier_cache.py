@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import logging
+from typing import Optional
+
+import tornado.options
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.constants.common import ScEventType
+from sc_client.models import ScAddr, ScTemplate, ScIdtfResolveParams, ScEventSubscriptionParams
+from sc_client.sc_keynodes import ScKeynodes
+
+from keynodes import KeynodeSysIdentifiers
+from lru_cache import LruCache
+
+logger = logging.getLogger()
+
+LINK = "_link"
+ELEMENT = "_element"
+RELATION = "_relation"
+
+
+class IdentifierCache:
+    """Identifiers of sc-elements and sc-elements by identifiers, shared by all handlers
+
+    Keeps sc-addr <-> system identifier and (sc-addr, language) <-> main
+    identifier in bounded LRU caches. Lookups that found nothing are kept
+    apart: a new identifier can only outdate them, so additions to
+    nrel_system_identifier, nrel_main_idtf or nrel_idtf drop just those.
+    Removals drop everything.
+    """
+
+    def __init__(self):
+        self._system_idtfs: Optional[LruCache] = None
+        self._by_system_idtf: Optional[LruCache] = None
+        self._main_idtfs: Optional[LruCache] = None
+        self._by_main_idtf: Optional[LruCache] = None
+        # keys of the lookups above that found nothing
+        self._not_found: Optional[LruCache] = None
+        self._subscriptions = []
+
+    def _caches(self):
+        if self._system_idtfs is None:
+            size = tornado.options.options.idtf_cache_size
+            self._system_idtfs = LruCache(size)
+            self._by_system_idtf = LruCache(size)
+            self._main_idtfs = LruCache(size)
+            self._by_main_idtf = LruCache(size)
+            self._not_found = LruCache(size)
+        return self._system_idtfs, self._by_system_idtf, self._main_idtfs, self._by_main_idtf, self._not_found
+
+    def subscribe(self) -> None:
+        """(Re)subscribe to the identifiers changes, e.g. after reconnect
+        """
+        keynodes = ScKeynodes()
+        watched = [keynodes[KeynodeSysIdentifiers.nrel_system_identifier.value],
+                   keynodes[KeynodeSysIdentifiers.nrel_main_idtf.value],
+                   keynodes[KeynodeSysIdentifiers.nrel_idtf.value]]
+        self._subscriptions = client.create_elementary_event_subscriptions(*[
+            ScEventSubscriptionParams(addr, event_type, callback)
+            for addr in watched
+            for event_type, callback in ((ScEventType.AFTER_GENERATE_OUTGOING_ARC, self.invalidate_not_found),
+                                         (ScEventType.BEFORE_ERASE_OUTGOING_ARC, self.invalidate))
+        ])
+        self.invalidate()
+
+    def invalidate(self, *_) -> None:
+        for cache in self._caches():
+            cache.clear()
+
+    def invalidate_not_found(self, *_) -> None:
+        # identifiers are added on every command and new session, found ones stay valid
+        self._caches()[-1].clear()
+
+    def get_system_identifier(self, addr: ScAddr) -> str:
+        system_idtfs, by_system_idtf, _, _, not_found = self._caches()
+        if not_found.get(('system_idtf', addr)):
+            return ""
+        idtf = system_idtfs.get(addr)
+        if idtf is None:
+            idtf = self._search_identifier(addr, KeynodeSysIdentifiers.nrel_system_identifier)
+            if idtf:
+                system_idtfs.put(addr, idtf)
+                by_system_idtf.put(idtf, addr)
+            else:
+                not_found.put(('system_idtf', addr), True)
+        return idtf
+
+    def get_main_identifier(self, addr: ScAddr, lang: ScAddr) -> str:
+        """Returns main identifier of `addr` in `lang`, empty if there is none
+        """
+        _, _, main_idtfs, by_main_idtf, not_found = self._caches()
+        if not_found.get(('main_idtf', addr, lang)):
+            return ""
+        idtf = main_idtfs.get((addr, lang))
+        if idtf is None:
+            idtf = self._search_identifier(addr, KeynodeSysIdentifiers.nrel_main_idtf, lang)
+            if idtf:
+                main_idtfs.put((addr, lang), idtf)
+                by_main_idtf.put((lang, idtf), addr)
+            else:
+                not_found.put(('main_idtf', addr, lang), True)
+        return idtf
+
+    def get_by_system_identifier(self, idtf: str) -> ScAddr:
+        system_idtfs, by_system_idtf, _, _, not_found = self._caches()
+        if not_found.get(('by_system_idtf', idtf)):
+            return ScAddr(0)
+        addr = by_system_idtf.get(idtf)
+        if addr is None:
+            addr = client.resolve_keynodes(ScIdtfResolveParams(idtf=idtf, type=None))[0]
+            if addr.is_valid():
+                by_system_idtf.put(idtf, addr)
+                system_idtfs.put(addr, idtf)
+            else:
+                not_found.put(('by_system_idtf', idtf), True)
+        return addr
+
+    def get_by_identifier_translated(self, lang: ScAddr, idtf: str) -> ScAddr:
+        """Returns sc-element with main identifier (or else identifier) `idtf` in `lang`
+        """
+        _, _, _, by_main_idtf, not_found = self._caches()
+        if not_found.get(('by_main_idtf', lang, idtf)):
+            return ScAddr(0)
+        addr = by_main_idtf.get((lang, idtf))
+        if addr is None:
+            addr = self._search_by_identifier(lang, idtf)
+            if addr.is_valid():
+                by_main_idtf.put((lang, idtf), addr)
+            else:
+                not_found.put(('by_main_idtf', lang, idtf), True)
+        return addr
+
+    @staticmethod
+    def _search_identifier(addr: ScAddr, relation: KeynodeSysIdentifiers, lang: ScAddr = None) -> str:
+        template = ScTemplate()
+        template.quintuple(
+            addr,
+            sc_type.VAR_COMMON_ARC,
+            (sc_type.VAR_NODE_LINK, LINK),
+            sc_type.VAR_PERM_POS_ARC,
+            ScKeynodes()[relation.value],
+        )
+        if lang is not None:
+            template.triple(
+                lang,
+                sc_type.VAR_PERM_POS_ARC,
+                LINK,
+            )
+        result = client.search_by_template(template)
+        if result:
+            return client.get_link_content(result[0].get(LINK))[0].data
+        return ""
+
+    @staticmethod
+    def _search_by_identifier(lang: ScAddr, idtf: str) -> ScAddr:
+        keynodes = ScKeynodes()
+        main_idtf = keynodes[KeynodeSysIdentifiers.nrel_main_idtf.value]
+        relations = (main_idtf, keynodes[KeynodeSysIdentifiers.nrel_idtf.value])
+
+        found = ScAddr(0)
+        for link in client.search_links_by_contents(idtf)[0]:
+            template = ScTemplate()
+            template.quintuple(
+                (sc_type.UNKNOWN, ELEMENT),
+                sc_type.VAR_COMMON_ARC,
+                link,
+                sc_type.VAR_PERM_POS_ARC,
+                (sc_type.VAR_NODE_NON_ROLE, RELATION),
+            )
+            template.triple(
+                lang,
+                sc_type.VAR_PERM_POS_ARC,
+                link,
+            )
+            for result in client.search_by_template(template):
+                relation = result.get(RELATION)
+                if relation == main_idtf:
+                    return result.get(ELEMENT)
+                if relation in relations and not found.is_valid():
+                    found = result.get(ELEMENT)
+        return found
+
+
+identifier_cache = IdentifierCache()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.constants.common import ScEventType
+from sc_client.models import ScAddr, ScTemplate, ScEventSubscriptionParams
+from sc_client.sc_keynodes import ScKeynodes
+
+from keynodes import KeynodeSysIdentifiers
+
+logger = logging.getLogger()
+
+CHANGE_EVENTS = (ScEventType.AFTER_GENERATE_OUTGOING_ARC, ScEventType.BEFORE_ERASE_OUTGOING_ARC)
+
+
+class MenuCache:
+    """Main menu commands, read from sc-memory once and kept until the menu changes
+
+    The whole ui_main_menu decomposition tree is read with three searches:
+    decomposition arcs of all commands and members of the atomic and
+    non-atomic command classes. Changes of these relations and of the
+    decomposition sets of the menu mark the cache as outdated.
+    """
+
+    def __init__(self):
+        self._commands: List[int] = []
+        self._tree: Dict = {}
+        self._etag = ''
+        self._is_valid = False
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self._node_subscriptions = []
+
+    def subscribe(self) -> None:
+        """(Re)subscribe to the menu changes, e.g. after reconnect
+        """
+        keynodes = ScKeynodes()
+        watched = [
+            keynodes[KeynodeSysIdentifiers.nrel_ui_commands_decomposition.value],
+            keynodes[KeynodeSysIdentifiers.ui_user_command_class_atom.value],
+            keynodes[KeynodeSysIdentifiers.ui_user_command_class_noatom.value],
+        ]
+        self._subscriptions = self._subscribe(watched)
+        self._node_subscriptions = []
+        self.invalidate()
+
+    def invalidate(self, *_) -> None:
+        self._is_valid = False
+
+    def get(self) -> Tuple[str, List[int], Dict]:
+        """Returns ETag of the menu, sc-addrs of its atomic commands in the order
+            of the menu and its hierarchy map: {'cmd_type': 'cmd_atom' | 'cmd_noatom' | 'unknown',
+            'id': sc-addr, 'childs': [maps of child commands]}, 'childs' only for decomposed commands
+        """
+        with self._lock:
+            if not self._is_valid:
+                # changes made while building leave the cache invalid
+                self._is_valid = True
+                self._build()
+            return self._etag, self._commands, self._tree
+
+    def _build(self) -> None:
+        keynodes = ScKeynodes()
+        root = keynodes[KeynodeSysIdentifiers.ui_main_menu.value]
+        atoms = self._search_members(keynodes[KeynodeSysIdentifiers.ui_user_command_class_atom.value])
+        noatoms = self._search_members(keynodes[KeynodeSysIdentifiers.ui_user_command_class_noatom.value])
+
+        DECOMPOSITION_NODE = "_decomposition"
+        COMMAND_NODE = "_command"
+        CHILD_NODE = "_child"
+        template = ScTemplate()
+        template.quintuple(
+            (sc_type.VAR_NODE, DECOMPOSITION_NODE),
+            sc_type.VAR_COMMON_ARC,
+            (sc_type.VAR_NODE, COMMAND_NODE),
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes[KeynodeSysIdentifiers.nrel_ui_commands_decomposition.value],
+        )
+        template.triple(
+            DECOMPOSITION_NODE,
+            sc_type.VAR_PERM_POS_ARC,
+            (sc_type.UNKNOWN, CHILD_NODE),
+        )
+        children: Dict[ScAddr, List[ScAddr]] = defaultdict(list)
+        decompositions: Dict[ScAddr, ScAddr] = {}
+        for result in client.search_by_template(template):
+            command = result.get(COMMAND_NODE)
+            children[command].append(result.get(CHILD_NODE))
+            decompositions.setdefault(command, result.get(DECOMPOSITION_NODE))
+
+        commands = []
+        visited: Set[ScAddr] = set()
+
+        def parse(cmd_addr: ScAddr, path: Set[ScAddr]) -> Dict:
+            visited.add(cmd_addr)
+            if cmd_addr in atoms:
+                cmd_type = 'cmd_atom'
+                commands.append(cmd_addr.value)
+            elif cmd_addr in noatoms:
+                cmd_type = 'cmd_noatom'
+            else:
+                cmd_type = 'unknown'
+            attrs = {'cmd_type': cmd_type, 'id': cmd_addr.value}
+            if cmd_addr in children:
+                # a command that is its own ancestor would make the tree infinite
+                path = path | {cmd_addr}
+                attrs['childs'] = [parse(child, path) for child in children[cmd_addr] if child not in path]
+            return attrs
+
+        tree = parse(root, set())
+        etag = hashlib.sha1(json.dumps([commands, tree]).encode('utf-8')).hexdigest()
+
+        # new decomposition sets of the menu are watched too
+        menu_decompositions = [decompositions[command] for command in visited if command in decompositions]
+        if self._node_subscriptions:
+            client.destroy_elementary_event_subscriptions(*self._node_subscriptions)
+        self._node_subscriptions = self._subscribe(menu_decompositions)
+
+        self._commands, self._tree, self._etag = commands, tree, etag
+        logger.info(f'Main menu is cached: {len(visited)} commands, {len(commands)} atomic')
+
+    def _subscribe(self, addrs: List[ScAddr]) -> List:
+        if not addrs:
+            return []
+        return client.create_elementary_event_subscriptions(*[
+            ScEventSubscriptionParams(addr, event_type, self.invalidate)
+            for addr in addrs
+            for event_type in CHANGE_EVENTS
+        ])
+
+    @staticmethod
+    def _search_members(class_addr: ScAddr) -> Set[ScAddr]:
+        template = ScTemplate()
+        template.triple(
+            class_addr,
+            sc_type.VAR_PERM_POS_ARC,
+            sc_type.UNKNOWN,
+        )
+        return {result.get(2) for result in client.search_by_template(template)}
+
+
+menu_cache = MenuCache()
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
+from typing import Dict, List, Tuple
+
 from sc_client import client
+from sc_client.models import ScAddr
 from sc_client.sc_keynodes import ScKeynodes
 
-import apiai
 import json
 from . import base
 import decorators
+import sc_executor
 
 import tornado.web
 
@@ -13,40 +16,39 @@ from keynodes import KeynodeSysIdentifiers
 
 
 from . import api_logic as logic
+from .nl_client import NlError, get_nl_client
 
 
 @decorators.class_logging
 class NaturalLanguageSearch(base.BaseHandler):
-    # @tornado.web.asynchronous
-    def post(self):
-        keynodes = ScKeynodes()
-        sc_session = logic.ScSession(self, client)
-
-        ai = apiai.ApiAI(
-            tornado.options.options.apiai_client_access_token, tornado.options.options.apiai_subscription_key)
-        request = ai.text_request()
-
+    async def post(self):
         query = self.get_argument('query', u'')
-        request.query = query.encode('utf-8')
+        sc_session = logic.ScSession.for_handler(self)
+        used_lang = await sc_executor.run(sc_session.get_used_language)
+        sc_session.save(self)
 
         # TODO: make universal language selection
-        keynode_lang_ru = keynodes[KeynodeSysIdentifiers.lang_ru.value]
-        used_lang = sc_session.get_used_language()
-        if used_lang == keynode_lang_ru:
-            request.lang = 'ru'
-        else:
-            request.lang = 'en'
+        lang = 'ru' if used_lang == ScKeynodes()[KeynodeSysIdentifiers.lang_ru.value] else 'en'
+        try:
+            action_result = await get_nl_client().query(query, lang)
+        except NlError as e:
+            raise tornado.web.HTTPError(502, str(e))
 
-        response = request.getresponse()
+        cmd_addr, arguments = await sc_executor.run(self.recognize_command, action_result, used_lang)
 
         result = '[]'
-        apiRes = json.loads(response.read())
-        actionResult = apiRes['result']
-        cmd_addr = keynodes[str(actionResult['action'])]
         if cmd_addr.is_valid():
-            arguments = []
+            result = await logic.do_command(cmd_addr, arguments, self, sc_session)
+
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(result))
 
-            parameters = actionResult['parameters']
+    def recognize_command(self, action_result: Dict, used_lang: ScAddr) -> Tuple[ScAddr, List[ScAddr]]:
+        keynodes = ScKeynodes()
+        cmd_addr = keynodes[str(action_result['action'])]
+        arguments = []
+        if cmd_addr.is_valid():
+            parameters = action_result['parameters']
 
             idx = 1
             found = True
@@ -55,15 +57,12 @@ class NaturalLanguageSearch(base.BaseHandler):
                 idx = idx + 1
                 found = False
                 try:
-                    arg_addr = logic.get_by_identifier_translated(used_lang, str(parameters[key].encode('utf-8')))
-                    if arg_addr is not None:
+                    arg_addr = logic.get_by_identifier_translated(used_lang, str(parameters[key]))
+                    if arg_addr.is_valid():
                         arguments.append(arg_addr)
                         found = True
 
                 except KeyError:
                     break
 
-            result = logic.do_command(cmd_addr, arguments, self)
-
-        self.set_header("Content-Type", "application/json")
-        self.finish(json.dumps(result))
+        return cmd_addr, arguments
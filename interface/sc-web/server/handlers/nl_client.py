@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import http.client
+import json
+import logging
+import threading
+import time
+import urllib.parse
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import tornado.ioloop
+import tornado.options
+
+from apiai.apiai import DEFAULT_VERSION
+from lru_cache import LruCache
+
+logger = logging.getLogger()
+
+
+class NlError(Exception):
+    pass
+
+
+class NlBackend(ABC):
+    """Recognizes intent of a text command, returns `result` of the api.ai query response
+    """
+
+    @abstractmethod
+    async def query(self, text: str, lang: str) -> Dict:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class ApiAiBackend(NlBackend):
+    """api.ai client over keep-alive HTTPS connections, one per worker thread
+
+    Every worker keeps its connection open between queries, so a query pays
+    a TLS handshake only when the connection was closed by the service.
+    `timeout` bounds the whole query, including the retry on a new connection.
+    """
+
+    HOST = 'api.api.ai'
+    PATH = '/v1/query?' + urllib.parse.urlencode({'v': DEFAULT_VERSION})
+
+    def __init__(self, client_access_token: str, subscription_key: str, connections: int, timeout: float):
+        self.headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json; charset=utf-8',
+            'Authorization': f'Bearer {client_access_token}',
+            'ocp-apim-subscription-key': subscription_key,
+        }
+        self.timeout = timeout
+        self.session_id = uuid.uuid4().hex
+        self._executor = ThreadPoolExecutor(max_workers=connections, thread_name_prefix='nl-client')
+        self._local = threading.local()
+
+    async def query(self, text: str, lang: str) -> Dict:
+        body = json.dumps({
+            'query': text,
+            'lang': lang,
+            'sessionId': self.session_id,
+            'contexts': [],
+            'timezone': '',
+            'resetContexts': False,
+            'entities': None,
+        }).encode('utf-8')
+        deadline = time.monotonic() + self.timeout
+        posted = tornado.ioloop.IOLoop.current().run_in_executor(self._executor, self._post, body, deadline)
+        try:
+            return await asyncio.wait_for(posted, self.timeout)
+        except asyncio.TimeoutError as e:
+            raise NlError(f'api.ai query timed out after {self.timeout} s') from e
+
+    def _post(self, body: bytes, deadline: float) -> Dict:
+        for attempt in range(2):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise NlError(f'api.ai query timed out after {self.timeout} s')
+            connection = self._connection()
+            # socket operations of this attempt may not outlast the query
+            connection.timeout = remaining
+            if connection.sock is not None:
+                connection.sock.settimeout(remaining)
+            try:
+                connection.request('POST', self.PATH, body, self.headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                self._local.connection = None
+                # the service may have closed an idle connection, a new one is tried once
+                if attempt or isinstance(e, TimeoutError):
+                    raise NlError(f'api.ai request failed: {e}') from e
+                continue
+
+            if response.status != 200:
+                raise NlError(f'api.ai responded with {response.status}: {data[:200]!r}')
+            try:
+                return json.loads(data)['result']
+            except (ValueError, KeyError, TypeError) as e:
+                raise NlError(f'api.ai responded with no result: {data[:200]!r}') from e
+
+    def _connection(self) -> http.client.HTTPSConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = http.client.HTTPSConnection(self.HOST, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class StubBackend(NlBackend):
+    """Local backend for development and testing, answers from a JSON file
+
+    The file maps a language to queries and their results, e.g.
+    {"en": {"what is a room": {"action": "ui_menu_view_full_semantic_neighborhood",
+    "parameters": {"ui_arg_1": "room"}}}}. Unknown queries get an empty action.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            self.results = {lang: {normalize_query(query): result for query, result in queries.items()}
+                            for lang, queries in json.load(f).items()}
+
+    async def query(self, text: str, lang: str) -> Dict:
+        return self.results.get(lang, {}).get(normalize_query(text), {'action': '', 'parameters': {}})
+
+
+def normalize_query(text: str) -> str:
+    return ' '.join(text.lower().split())
+
+
+class NlClient:
+    """Natural language queries with results cached by (normalized query, language)
+
+    Concurrent equal queries wait for the same backend call.
+    """
+
+    def __init__(self, backend: NlBackend, cache_size: int):
+        self.backend = backend
+        self._cache = LruCache(cache_size)
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    async def query(self, text: str, lang: str) -> Dict:
+        key = (normalize_query(text), lang)
+        result = self._cache.get(key)
+        if result is not None:
+            return result
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = asyncio.ensure_future(self.backend.query(text, lang))
+        self._pending[key] = pending
+        try:
+            result = await asyncio.shield(pending)
+        finally:
+            del self._pending[key]
+        self._cache.put(key, result)
+        return result
+
+
+_nl_client: Optional[NlClient] = None
+
+
+def get_nl_client() -> NlClient:
+    global _nl_client
+    if _nl_client is None:
+        options = tornado.options.options
+        if options.nl_backend == 'stub':
+            backend = StubBackend(options.nl_stub_path)
+        else:
+            backend = ApiAiBackend(options.apiai_client_access_token, options.apiai_subscription_key,
+                                   options.nl_connections, options.nl_timeout)
+        _nl_client = NlClient(backend, options.nl_cache_size)
+    return _nl_client
+
+
+def shutdown() -> None:
+    if _nl_client is not None:
+        _nl_client.backend.close()
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+import tornado.web
+
+import metrics
+
+
+class Metrics(tornado.web.RequestHandler):
+    """Latency histograms of the instrumented methods of this server process
+
+    Served outside of the request slots of BaseHandler, so the stats can be
+    scraped while the server is overloaded.
+    """
+
+    def get(self):
+        if not metrics.enabled:
+            raise tornado.web.HTTPError(404)
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.set_header('Cache-Control', 'no-store')
+        self.finish(metrics.export())
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import logging
+from typing import Dict, List, Tuple
+
+import tornado.options
+from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.constants.common import ScEventType
+from sc_client.models import ScAddr, ScTemplate, ScEventSubscriptionParams
+from sc_client.sc_keynodes import ScKeynodes
+
+from keynodes import KeynodeSysIdentifiers
+from lru_cache import LruCache
+
+logger = logging.getLogger()
+
+CHANGE_EVENTS = (ScEventType.AFTER_GENERATE_OUTGOING_ARC, ScEventType.BEFORE_ERASE_OUTGOING_ARC)
+# tooltip classes in the order of preference
+TOOLTIP_CLASSES = (
+    KeynodeSysIdentifiers.sc_definition,
+    KeynodeSysIdentifiers.sc_explanation,
+    KeynodeSysIdentifiers.sc_note,
+)
+# up to this number of missed elements each one is searched separately,
+# more of them may be found with one search per tooltip class
+SEPARATE_SEARCH_LIMIT = 4
+# the search per tooltip class scans all tooltips in a language, it is chosen only while
+# it finds at most this many of them per missed element (it is tried once to count them)
+SCAN_TOOLTIPS_PER_ELEMENT = 25
+
+KEY_SC_ELEMENT = "_key_sc_element"
+ELEMENT = "_element"
+CLASS = "_class"
+TEXT_LINK = "_text_link"
+
+
+class TooltipService:
+    """Finds tooltips (definition, explanation or note text) of many sc-elements at once
+
+    Found texts, empty ones too, are kept in an LRU cache by (element, language)
+    until the key sc-element or text translation structures change.
+    """
+
+    def __init__(self):
+        self._cache = None
+        self._subscriptions = []
+        # number of tooltips found by the last scan of a language
+        self._tooltip_counts: Dict[ScAddr, int] = {}
+
+    @property
+    def cache(self) -> LruCache:
+        if self._cache is None:
+            self._cache = LruCache(tornado.options.options.tooltip_cache_size)
+        return self._cache
+
+    def subscribe(self) -> None:
+        """(Re)subscribe to the tooltip structures changes, e.g. after reconnect
+        """
+        keynodes = ScKeynodes()
+        watched = [keynodes[KeynodeSysIdentifiers.rrel_key_sc_element.value],
+                   keynodes[KeynodeSysIdentifiers.nrel_sc_text_translation.value]]
+        watched += [keynodes[tooltip_class.value] for tooltip_class in TOOLTIP_CLASSES]
+        self._subscriptions = client.create_elementary_event_subscriptions(*[
+            ScEventSubscriptionParams(addr, event_type, self.cache.clear)
+            for addr in watched
+            for event_type in CHANGE_EVENTS
+        ])
+        self.cache.clear()
+
+    def get(self, addrs: List[ScAddr], lang: ScAddr) -> Dict[ScAddr, str]:
+        """Returns tooltip text in `lang` for every element of `addrs`, empty if it has no tooltip
+        """
+        cached = self.cache.get_many((addr, lang) for addr in addrs)
+        tooltips = {addr: cached[(addr, lang)] for addr in addrs if (addr, lang) in cached}
+        missed = list(dict.fromkeys(addr for addr in addrs if addr not in tooltips))
+        if not missed:
+            return tooltips
+
+        if not self._is_scan_cheaper(len(missed), lang):
+            links = self._search_separately(missed, lang)
+            found = [addr for addr in missed if addr in links]
+        else:
+            links = self._search_by_classes(lang)
+            self._tooltip_counts[lang] = len(links)
+            # the scan finds tooltips of the whole knowledge base, the ones not asked for
+            # are cached too, as far as the cache allows, and before the requested ones
+            found = [addr for addr in missed if addr in links]
+            requested = set(found)
+            extra = [addr for addr in links if addr not in requested and (addr, lang) not in self.cache]
+            found = extra[:max(self.cache.size - len(missed), 0)] + found
+
+        contents = client.get_link_content(*[links[addr] for addr in found]) if found else []
+        texts = {addr: content.data for addr, content in zip(found, contents)}
+        for addr, text in texts.items():
+            self.cache.put((addr, lang), text)
+        for addr in missed:
+            tooltips[addr] = texts.get(addr, "")
+            if addr not in texts:
+                self.cache.put((addr, lang), "")
+        return tooltips
+
+    def _is_scan_cheaper(self, missed: int, lang: ScAddr) -> bool:
+        if missed <= SEPARATE_SEARCH_LIMIT:
+            return False
+        count = self._tooltip_counts.get(lang)
+        return count is None or count <= missed * SCAN_TOOLTIPS_PER_ELEMENT
+
+    def _search_separately(self, addrs: List[ScAddr], lang: ScAddr) -> Dict[ScAddr, ScAddr]:
+        keynodes = ScKeynodes()
+        order = {keynodes[tooltip_class.value]: i for i, tooltip_class in enumerate(TOOLTIP_CLASSES)}
+
+        links = {}
+        for addr in addrs:
+            template = ScTemplate()
+            template.quintuple(
+                (sc_type.VAR_NODE, KEY_SC_ELEMENT),
+                sc_type.VAR_PERM_POS_ARC,
+                addr,
+                sc_type.VAR_PERM_POS_ARC,
+                keynodes[KeynodeSysIdentifiers.rrel_key_sc_element.value],
+            )
+            template.triple(
+                (sc_type.VAR_NODE, CLASS),
+                sc_type.VAR_PERM_POS_ARC,
+                KEY_SC_ELEMENT,
+            )
+            self._add_translation(template, lang)
+
+            best = None
+            for result in client.search_by_template(template):
+                rank = order.get(result.get(CLASS))
+                if rank is not None and (best is None or rank < best[0]):
+                    best = (rank, result.get(TEXT_LINK))
+            if best is not None:
+                links[addr] = best[1]
+        return links
+
+    def _search_by_classes(self, lang: ScAddr) -> Dict[ScAddr, ScAddr]:
+        keynodes = ScKeynodes()
+
+        links = {}
+        for tooltip_class in TOOLTIP_CLASSES:
+            template = ScTemplate()
+            template.triple(
+                keynodes[tooltip_class.value],
+                sc_type.VAR_PERM_POS_ARC,
+                (sc_type.VAR_NODE, KEY_SC_ELEMENT),
+            )
+            template.quintuple(
+                KEY_SC_ELEMENT,
+                sc_type.VAR_PERM_POS_ARC,
+                (sc_type.UNKNOWN, ELEMENT),
+                sc_type.VAR_PERM_POS_ARC,
+                keynodes[KeynodeSysIdentifiers.rrel_key_sc_element.value],
+            )
+            self._add_translation(template, lang)
+
+            for result in client.search_by_template(template):
+                # a better class found before wins
+                links.setdefault(result.get(ELEMENT), result.get(TEXT_LINK))
+        return links
+
+    @staticmethod
+    def _add_translation(template: ScTemplate, lang: ScAddr) -> None:
+        TRANSLATION_NODE = "_translation"
+        template.quintuple(
+            (sc_type.VAR_NODE, TRANSLATION_NODE),
+            sc_type.VAR_COMMON_ARC,
+            KEY_SC_ELEMENT,
+            sc_type.VAR_PERM_POS_ARC,
+            ScKeynodes()[KeynodeSysIdentifiers.nrel_sc_text_translation.value],
+        )
+        template.triple(
+            TRANSLATION_NODE,
+            sc_type.VAR_PERM_POS_ARC,
+            (sc_type.VAR_NODE_LINK, TEXT_LINK),
+        )
+        template.triple(
+            lang,
+            sc_type.VAR_PERM_POS_ARC,
+            TEXT_LINK,
+        )
+
+
+tooltip_service = TooltipService()
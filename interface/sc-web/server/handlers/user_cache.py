@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import tornado.options
+
+
+class UserCache:
+    """Authenticated users by their cookie key, kept for --user_cache_ttl seconds
+
+    The cached user keeps its role rights and, once asked for, its roles
+    in the knowledge base. Entries are dropped explicitly when the user or
+    its rights change in this process, other processes see the change
+    when the entry expires.
+    """
+
+    def __init__(self):
+        self._users: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            cached = self._users.get(key)
+            if cached is None:
+                return None
+            user, expires = cached
+            if expires < time.monotonic():
+                del self._users[key]
+                return None
+            return user
+
+    def put(self, key: str, user: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            # expired entries are dropped on the way, so only active users are kept
+            for expired in [k for k, (_, expires) in self._users.items() if expires < now]:
+                del self._users[expired]
+            self._users[key] = (user, now + tornado.options.options.user_cache_ttl)
+
+    def invalidate(self, key: str = None, email: str = None) -> None:
+        with self._lock:
+            if key is not None:
+                self._users.pop(key, None)
+            if email is not None:
+                for k in [k for k, (user, _) in self._users.items() if user.email == email]:
+                    del self._users[k]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
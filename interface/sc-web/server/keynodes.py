@@ -40,6 +40,19 @@ class KeynodeSysIdentifiers(Enum):
     nrel_expert = 'nrel_expert'
     
     rrel_key_sc_element = 'rrel_key_sc_element'
+
+    # command argument roles
+    rrel_1 = 'rrel_1'
+    rrel_2 = 'rrel_2'
+    rrel_3 = 'rrel_3'
+    rrel_4 = 'rrel_4'
+    rrel_5 = 'rrel_5'
+    rrel_6 = 'rrel_6'
+    rrel_7 = 'rrel_7'
+    rrel_8 = 'rrel_8'
+    rrel_9 = 'rrel_9'
+    rrel_10 = 'rrel_10'
+
     sc_definition = 'sc_definition'
     sc_explanation = 'sc_explanation'
     sc_note = 'sc_note'
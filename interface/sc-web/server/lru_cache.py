@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, Iterable, Optional, TypeVar
+
+VT = TypeVar('VT')
+
+
+class LruCache(Generic[VT]):
+    """Thread-safe mapping that keeps at most `size` most recently used items
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def get(self, key: Hashable, default: Optional[VT] = None) -> Optional[VT]:
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, VT]:
+        """Returns cached items among `keys`, the missing ones are omitted
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._items:
+                    self.hits += 1
+                    self._items.move_to_end(key)
+                    found[key] = self._items[key]
+                else:
+                    self.misses += 1
+        return found
+
+    def put(self, key: Hashable, value: VT) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self, *_) -> None:
+        with self._lock:
+            self._items.clear()
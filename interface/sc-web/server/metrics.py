@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import bisect
+import threading
+from typing import Dict, List
+
+# recording is switched on by --metrics, until then instrumented calls only check this flag
+enabled = False
+
+# upper bounds of the latency histogram buckets in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, float('inf'))
+
+
+class MethodStats:
+    """Number of calls of a method, their total time and a histogram of their latency
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.buckets: List[int] = [0] * len(BUCKETS)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.buckets[bucket] += 1
+
+
+_stats: Dict[str, MethodStats] = {}
+
+
+def get_stats(name: str) -> MethodStats:
+    """Returns stats of the method `name`, registered once when the method is instrumented
+    """
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats.setdefault(name, MethodStats(name))
+    return stats
+
+
+def export() -> str:
+    """Stats of all called methods in the Prometheus text format
+    """
+    lines = [
+        '# HELP sc_web_method_seconds Time spent in instrumented methods of this server process',
+        '# TYPE sc_web_method_seconds histogram',
+    ]
+    for name, stats in sorted(_stats.items()):
+        if not stats.count:
+            continue
+        with stats._lock:
+            count, total, buckets = stats.count, stats.total, list(stats.buckets)
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, buckets):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'sc_web_method_seconds_bucket{{method="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'sc_web_method_seconds_sum{{method="{name}"}} {total}')
+        lines.append(f'sc_web_method_seconds_count{{method="{name}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
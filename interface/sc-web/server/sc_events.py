@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+from typing import Callable, Iterable, Optional, Tuple, TypeVar
+
+import tornado.ioloop
+from sc_client import client
+from sc_client.constants.common import ScEventType
+from sc_client.models import ScAddr, ScEventSubscriptionParams
+
+import sc_executor
+
+logger = logging.getLogger()
+
+T = TypeVar('T')
+
+
+async def wait_for(check: Callable[[], Optional[T]],
+                   watched: Iterable[Tuple[ScAddr, ScEventType]],
+                   timeout: float) -> Optional[T]:
+    """Wait until `check` returns a truthy value and return it, or None after `timeout` seconds.
+
+    `check` runs once right away and then after each event on the `watched`
+    elements, so the result arrives as soon as sc-memory is changed instead
+    of on the next polling tick. Events come from the sc-client thread and are
+    handed to the IOLoop; a burst of them leads to a single check.
+    """
+    io_loop = tornado.ioloop.IOLoop.current()
+    future = asyncio.get_running_loop().create_future()
+    scheduled = False
+
+    async def run_check():
+        nonlocal scheduled
+        scheduled = False
+        if future.done():
+            return
+        try:
+            value = await sc_executor.run(check)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if value and not future.done():
+            future.set_result(value)
+
+    def on_event(*_):
+        nonlocal scheduled
+        if not scheduled:
+            scheduled = True
+            io_loop.add_callback(run_check)
+
+    # subscribe before the first check, so a change made in between is not lost
+    subscriptions = await sc_executor.run(
+        client.create_elementary_event_subscriptions,
+        *[ScEventSubscriptionParams(addr, event_type, on_event) for addr, event_type in watched])
+    try:
+        await run_check()
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        logger.debug('Timeout waiting for sc-memory event')
+        return None
+    finally:
+        await sc_executor.run(client.destroy_elementary_event_subscriptions, *subscriptions)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+import tornado.ioloop
+import tornado.options
+import tornado.web
+
+import db
+
+logger = logging.getLogger()
+
+RT = TypeVar('RT')
+
+_executor: Optional[ThreadPoolExecutor] = None
+_request_slots: Optional[asyncio.Semaphore] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=tornado.options.options.sc_workers, thread_name_prefix='sc-client')
+    return _executor
+
+
+def _run_task(func: Callable[..., RT], *args, **kwargs) -> RT:
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # a worker doesn't keep a database connection and loaded objects between tasks
+        db.remove_session()
+
+
+async def run(func: Callable[..., RT], *args, **kwargs) -> RT:
+    """Run a blocking sc-client (or database) call on the bounded executor
+        and wait for it without blocking the IOLoop
+    """
+    return await tornado.ioloop.IOLoop.current().run_in_executor(
+        get_executor(), functools.partial(_run_task, func, *args, **kwargs))
+
+
+async def acquire_request_slot() -> None:
+    """Wait until the number of requests in progress drops below the limit,
+        answers 503 if it doesn't happen in time
+    """
+    global _request_slots
+    if _request_slots is None:
+        _request_slots = asyncio.Semaphore(tornado.options.options.max_concurrent_requests)
+    try:
+        await asyncio.wait_for(_request_slots.acquire(), tornado.options.options.request_queue_timeout)
+    except asyncio.TimeoutError:
+        logger.warning('Too many requests in progress')
+        raise tornado.web.HTTPError(503, 'Too many requests in progress')
+
+
+def release_request_slot() -> None:
+    _request_slots.release()
+
+
+def shutdown() -> None:
+    if _executor is not None:
+        _executor.shutdown(wait=False)
@@ -1,15 +1,31 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
+import json
 import logging
+import os
 import re
-from glob import glob
-from os.path import exists, splitext, join, dirname, abspath, isdir, commonprefix, isfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists, splitext, join, dirname, abspath, isdir, isfile, relpath
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
 
 from sc_client import client
+from sc_client.constants import sc_type
+from sc_client.models import ScAddr, ScIdtfResolveParams, ScLinkContent, ScLinkContentType
 
 logger = logging.getLogger()
 
 REPO_FILE_EXT = ".path"
+# sc-link with hashes of the loaded fragments by their paths relative to the repo file
+LOADED_FRAGMENTS_IDTF = "sc_web_loaded_scs_fragments"
+READ_WORKERS = 8
+# seconds between checks and between reports of a process waiting for the loaded fragments
+WAIT_INTERVAL = 1.0
+WAIT_REPORT_INTERVAL = 30.0
+
+T = TypeVar('T')
 
 scs_paths = set()
 scs_exclude_paths = set()
@@ -49,41 +65,225 @@ def search_kb_sources(root_path: str):
     return scs_paths, scs_exclude_paths
 
 
-# read scs fragments unless they are excluded by repo.path
-def read_scs_fragments(root_path: str):
-    scs_fragments = []
-    paths, exclude_paths = search_kb_sources(root_path)
-    for path in paths:
-        # search for all scs in all subfolders of a path
-        if isdir(path):
-            for filename in glob(path + '/**/*.scs', recursive=True):
-                excluded = False
+class PathTrie:
+    """Excluded paths split into their components, a path is excluded when one of them is its prefix
+    """
+
+    def __init__(self, paths: Iterable[str] = ()):
+        self.children: Dict[str, 'PathTrie'] = {}
+        self.is_end = False
+        for path in paths:
+            self.add(path)
+
+    def add(self, path: str) -> None:
+        node = self
+        for part in _split(path):
+            node = node.children.setdefault(part, PathTrie())
+        node.is_end = True
 
-                # check if it's inside excluded paths
-                for path in exclude_paths:
-                    if commonprefix([filename, path]) == path:
-                        excluded = True
+    def find(self, path: str) -> Optional['PathTrie']:
+        """Returns the node of `path` to check its children with, None if nothing under `path` is excluded
+        """
+        node = self
+        for part in _split(path):
+            if node.is_end:
+                return node
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
 
-                if excluded:
+
+def _split(path: str):
+    return [part for part in abspath(path).split(os.sep) if part]
+
+
+def _walk_scs_files(path: str, excluded: Optional[PathTrie]) -> Iterator[str]:
+    # every directory is listed once, excluded subtrees, hidden entries and
+    # symlinked directories (which could loop) are not entered
+    stack = [(path, excluded)]
+    while stack:
+        directory, node = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.name.startswith('.'):
                     continue
-                else:
-                    with open(filename, 'r', encoding='utf-8') as f:
-                        scs_fragments.append(f.read())
+                child = node.children.get(entry.name) if node is not None else None
+                if child is not None and child.is_end:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, child))
+                elif entry.name.endswith('.scs') and entry.is_file():
+                    yield entry.path
 
-        elif isfile(path) and splitext(path)[1] == '.scs':
-            if path not in exclude_paths:
-                with open(path, 'r', encoding='utf-8') as f:
-                    scs_fragments.append(f.read())
 
+# search scs files unless they are excluded by repo.path
+def search_scs_files(root_path: str) -> Iterator[str]:
+    paths, exclude_paths = search_kb_sources(root_path)
+    excluded = PathTrie(exclude_paths)
+    found = set()
+    for path in sorted(paths):
+        node = excluded.find(path)
+        if node is not None and node.is_end:
+            continue
+
+        # search for all scs in all subfolders of a path
+        if isdir(path):
+            filenames = _walk_scs_files(path, node)
+        elif isfile(path) and splitext(path)[1] == '.scs':
+            filenames = [path]
         elif not exists(path):
             logger.error(f"Read scs-fragments: {path} does not exist")
             exit(1)
-
         else:
             continue
 
-    return scs_fragments
+        for filename in filenames:
+            if filename not in found:
+                found.add(filename)
+                yield filename
+
+
+def read_files(filenames: Iterable[str], read: Callable[[str], T], workers: int = READ_WORKERS) -> Iterator[T]:
+    """Applies `read` to the files in a thread pool while they are found, results go in the order of `filenames`
+
+    At most twice as many files as there are workers are read ahead.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scs_reader') as executor:
+        pending = deque()
+        for filename in filenames:
+            pending.append(executor.submit(read, filename))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
 
+def _read_text(filename: str) -> Tuple[str, str]:
+    with open(filename, 'r', encoding='utf-8') as f:
+        return filename, f.read()
 
-def load_scs_fragments(root_path: str):
-    client.generate_elements_by_scs(read_scs_fragments(root_path))
+
+def read_scs_fragments(root_path: str) -> Iterator[Tuple[str, str]]:
+    """Yields file names and texts of scs-fragments of repo.path
+    """
+    return read_files(search_scs_files(root_path), _read_text)
+
+
+# hashes of the files by their paths, an unchanged file is not read again while its size and mtime stay the same
+_file_hashes: Dict[str, Tuple[int, int, str]] = {}
+
+
+def read_changed_file(filename: str, known_hash: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Returns hash of the file and its text, no text if the file still has `known_hash`
+    """
+    stat = os.stat(filename)
+    cached = _file_hashes.get(filename)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size) and cached[2] == known_hash:
+        return known_hash, None
+    with open(filename, 'rb') as f:
+        data = f.read()
+    file_hash = hashlib.sha1(data).hexdigest()
+    _file_hashes[filename] = (stat.st_mtime_ns, stat.st_size, file_hash)
+    if file_hash == known_hash:
+        return file_hash, None
+    return file_hash, data.decode('utf-8')
+
+
+def get_loaded_fragments() -> Tuple[ScAddr, Dict[str, str]]:
+    """Returns sc-link that lists the loaded fragments and their hashes,
+        invalid sc-addr and nothing if fragments were never loaded into this sc-memory
+    """
+    marker = client.resolve_keynodes(ScIdtfResolveParams(idtf=LOADED_FRAGMENTS_IDTF, type=None))[0]
+    if not marker.is_valid():
+        return marker, {}
+    try:
+        return marker, json.loads(client.get_link_content(marker)[0].data)
+    except (TypeError, ValueError):
+        logger.warning(f"Content of {LOADED_FRAGMENTS_IDTF} is not valid, all scs-fragments will be loaded")
+        return marker, {}
+
+
+def wait_for_loaded_fragments(idtfs: Iterable[str]) -> None:
+    """Waits until scs-fragments were loaded into this sc-memory by another process
+        and all `idtfs` are found in it
+    """
+    idtfs = list(idtfs)
+    started = reported = time.monotonic()
+    while True:
+        params = [ScIdtfResolveParams(idtf=idtf, type=None) for idtf in [LOADED_FRAGMENTS_IDTF] + idtfs]
+        missing = [param.idtf for param, addr in zip(params, client.resolve_keynodes(*params)) if not addr.is_valid()]
+        if not missing:
+            return
+        now = time.monotonic()
+        if now - reported >= WAIT_REPORT_INTERVAL:
+            reported = now
+            logger.warning(f"Waiting {now - started:.0f} s for scs-fragments to be loaded, "
+                           f"not found yet: {', '.join(missing[:10])}")
+        time.sleep(WAIT_INTERVAL)
+
+
+def set_loaded_fragments(marker: ScAddr, loaded: Dict[str, str]) -> ScAddr:
+    if not marker.is_valid():
+        marker = client.resolve_keynodes(
+            ScIdtfResolveParams(idtf=LOADED_FRAGMENTS_IDTF, type=sc_type.CONST_NODE_LINK))[0]
+    client.set_link_contents(ScLinkContent(json.dumps(loaded, sort_keys=True), ScLinkContentType.STRING.value, marker))
+    return marker
+
+
+def load_scs_fragments(root_path: str, batch_size: int):
+    """Loads scs-fragments that are not in sc-memory yet or have changed since they were loaded
+
+    Changed files are uploaded in batches of about `batch_size` characters.
+    Hashes of the loaded files are kept in sc-memory, so nothing is uploaded
+    again after a reconnect or a restart of the server unless sources change.
+    """
+    root_dir = dirname(abspath(root_path))
+    marker, loaded = get_loaded_fragments()
+    known = dict(loaded)
+
+    def read(filename: str) -> Tuple[str, str, Optional[str]]:
+        path = relpath(filename, root_dir)
+        return (path,) + read_changed_file(filename, known.get(path))
+
+    found, changed = set(), 0
+    batch_paths, batch_hashes, batch_texts, batch_length = [], [], [], 0
+
+    def upload():
+        nonlocal marker
+        results = client.generate_elements_by_scs(batch_texts)
+        for path, file_hash, is_loaded in zip(batch_paths, batch_hashes, results):
+            if is_loaded:
+                loaded[path] = file_hash
+            else:
+                logger.error(f"Scs-fragment {path} is not loaded")
+        # an interrupted loading continues from the last uploaded batch
+        marker = set_loaded_fragments(marker, loaded)
+        batch_paths.clear()
+        batch_hashes.clear()
+        batch_texts.clear()
+
+    # files are uploaded while the rest of them are still searched and read
+    for path, file_hash, text in read_files(search_scs_files(root_path), read):
+        found.add(path)
+        if text is None:
+            continue
+        changed += 1
+        batch_paths.append(path)
+        batch_hashes.append(file_hash)
+        batch_texts.append(text)
+        batch_length += len(text)
+        if batch_length >= batch_size:
+            upload()
+            batch_length = 0
+    if batch_texts:
+        upload()
+
+    # fragments removed from sources stay in sc-memory, they aren't tracked anymore
+    if any(path not in found for path in loaded):
+        set_loaded_fragments(marker, {path: file_hash for path, file_hash in loaded.items() if path in found})
+
+    if changed:
+        logger.info(f"Loaded {changed} of {len(found)} scs-fragments")
+    else:
+        logger.info(f"All {len(found)} scs-fragments are already loaded")
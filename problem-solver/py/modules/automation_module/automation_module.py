@@ -8,11 +8,12 @@ from sc_kpm import ScModule
 from .room_state_detection_agent import RoomStateDetectionAgent
 from .create_instructions_agent import CreateInstructionsAgent
 from .edit_weather_conditions_agent import EditWeatherConditionsAgent
+from .weather_providers import WeatherProvider
 
 class AutomationModule(ScModule):
-    def __init__(self):
+    def __init__(self, weather_provider: WeatherProvider = None):
         super().__init__(
             RoomStateDetectionAgent(),
             CreateInstructionsAgent(),
-            EditWeatherConditionsAgent()
+            EditWeatherConditionsAgent(weather_provider)
         )
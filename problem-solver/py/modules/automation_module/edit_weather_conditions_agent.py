@@ -6,8 +6,6 @@ Distributed under the MIT License
 
 import logging
 from typing import List, Tuple
-from pyowm import OWM
-from pyowm.utils.config import get_default_config
 
 from sc_client.models import ScConstruction
 from sc_client.models import ScAddr, ScLinkContentType, ScLinkContent, ScTemplate
@@ -36,13 +34,13 @@ from sc_kpm.utils.action_utils import (
     generate_action_result
 )
 
-from sc_kpm import ScKeynodes
+from ..common.keynodes import keynodes
+from ..common.structure_gc import StructureCollector
 
 
 from datetime import datetime
-from .additions import get_interval
-
-PYOWM_TOKEN = "7ae68ffd9ddbe0af23386477fdd4c611"
+from ..common.additions import get_interval
+from .weather_providers import WeatherProvider, CachedWeatherProvider, OwmWeatherProvider
 
 
 logging.basicConfig(
@@ -51,8 +49,9 @@ logging.basicConfig(
 
 
 class EditWeatherConditionsAgent(ScAgentClassic):
-    def __init__(self):
+    def __init__(self, provider: WeatherProvider = None):
         super().__init__("action_edit_weather_conditions")
+        self.provider = provider if provider is not None else CachedWeatherProvider(OwmWeatherProvider())
 
     def on_event(self, action_class: ScAddr, arc: ScAddr, action: ScAddr) -> ScResult:
         result = self.run(action)
@@ -84,24 +83,16 @@ class EditWeatherConditionsAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_link"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_location", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_location
         )
         search_results = search_by_template(templ)
         if not search_results: return "", -1000, -1000 
         location = get_link_content_data(search_results[0].get("_link"))
-        try:
-            config_dict = get_default_config()
-            config_dict['language'] = 'en'  
-            owm = OWM(PYOWM_TOKEN, config_dict) 
-            weather_manager = owm.weather_manager()
-            observation = weather_manager.weather_at_place(location)
-            status = observation.weather.status
-            temp = observation.weather.temperature("celsius")['temp']
-            hum = observation.weather.humidity
-            return status.lower(), temp, hum
-        except Exception as e:
-            self.logger.info("EditWeatherConditionsAgent has some problems with pyowm.")
-            return "", -1000, -1000 
+        observation = self.provider.get(location)
+        if observation is None:
+            self.logger.info("EditWeatherConditionsAgent has got no weather for %s.", location)
+            return "", -1000, -1000
+        return observation.status, observation.temp, observation.hum
         
     def get_preferences(self, user: ScAddr) -> Tuple[float, float]:
         templ = ScTemplate()
@@ -110,28 +101,28 @@ class EditWeatherConditionsAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_prefs"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_prefs", sc_type.CONST_NODE_ROLE)
+            keynodes.nrel_prefs
         )
         templ.quintuple(
             "_prefs",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_temp_range"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp_range", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_temp_range
         )
         templ.quintuple(
             "_temp_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_temp_min"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_min", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_min
         )
         templ.quintuple(
             "_temp_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_temp_max"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_max", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_max
         )
 
         search_results = search_by_template(templ)
@@ -151,34 +142,29 @@ class EditWeatherConditionsAgent(ScAgentClassic):
             (sc_type.VAR_COMMON_ARC, "_arc3"),
             (sc_type.VAR_NODE_LINK, "_link1"),
             (sc_type.VAR_PERM_POS_ARC, "_arc2"),
-            ScKeynodes.resolve("nrel_temp", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_temp
         )
         templ.quintuple(
             weather,
             (sc_type.VAR_COMMON_ARC, "_arc5"),
             (sc_type.VAR_NODE_LINK, "_link2"),
             (sc_type.VAR_PERM_POS_ARC, "_arc4"),
-            ScKeynodes.resolve("nrel_hum", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_hum
         )
         templ.quintuple(
             weather,
             (sc_type.VAR_COMMON_ARC, "_arc7"),
             (sc_type.VAR_NODE_LINK, "_link3"),
             (sc_type.VAR_PERM_POS_ARC, "_arc6"),
-            ScKeynodes.resolve("nrel_timestamp", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_timestamp
         )
 
         search_results = search_by_template(templ)
         if not search_results: return None
-        for i in range(1, 8):
-            element = search_results[0].get("_arc" + str(i))
-            erase_elements(element)
-        for i in range(1, 4):
-            element = search_results[0].get("_link" + str(i))
-            erase_elements(element)
+        collector = StructureCollector()
+        collector.add_results(search_results[:1], "_arc1", "_link1", "_link2", "_link3")
+        collector.erase()
         return None
-    
-
 
     def create_measurements(self, weather: ScAddr, status: str, temp: float, hum: float) -> None:
         def create_link_with_content(content: str, type: ScLinkContentType):
@@ -190,7 +176,7 @@ class EditWeatherConditionsAgent(ScAgentClassic):
         
 
         timestamp = create_link_with_content(datetime.now().isoformat(), ScLinkContentType.STRING)
-        weather_state = ScKeynodes.resolve(f"concept_weather_{status.lower()}", sc_type.CONST_NODE_CLASS)
+        weather_state = keynodes[f"concept_weather_{status.lower()}"]
         temp = create_link_with_content(temp, ScLinkContentType.FLOAT)
         hum = create_link_with_content(hum, ScLinkContentType.FLOAT)
         templ = ScTemplate()
@@ -204,21 +190,21 @@ class EditWeatherConditionsAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             timestamp,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_timestamp", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_timestamp
         )
         templ.quintuple(
             weather,
             sc_type.VAR_COMMON_ARC,
             temp,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_temp
         )
         templ.quintuple(
             weather,
             sc_type.VAR_COMMON_ARC,
             hum,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_hum
         )
         generate_by_template(templ)
 
@@ -230,7 +216,7 @@ class EditWeatherConditionsAgent(ScAgentClassic):
     def edit_device_consequences(self, temp: float, temp_min: float, temp_max: float) -> None:
         templ = ScTemplate()
         templ.triple(
-            ScKeynodes.resolve("concept_weather_depended_device", sc_type.VAR_NODE_CLASS),
+            keynodes.concept_weather_depended_device,
             sc_type.VAR_PERM_POS_ARC,
             (sc_type.VAR_NODE_CLASS, "_device_class")
         )
@@ -247,10 +233,10 @@ class EditWeatherConditionsAgent(ScAgentClassic):
                 (sc_type.VAR_PERM_POS_ARC, "_arc1"),
                 (sc_type.VAR_NODE, "_state"),
                 (sc_type.VAR_PERM_POS_ARC, "_arc2"),
-                ScKeynodes.resolve("rrel_fixes_state", sc_type.CONST_NODE_ROLE)
+                keynodes.rrel_fixes_state
             )
             templ.triple(
-                ScKeynodes.resolve("concept_temp_state", sc_type.CONST_NODE_CLASS),
+                keynodes.concept_temp_state,
                 sc_type.VAR_PERM_POS_ARC,
                 "_state"
             )
@@ -265,10 +251,10 @@ class EditWeatherConditionsAgent(ScAgentClassic):
                 (sc_type.VAR_PERM_POS_ARC, "_arc3"),
                 (sc_type.VAR_NODE, "_state"),
                 (sc_type.VAR_PERM_POS_ARC, "_arc4"),
-                ScKeynodes.resolve("rrel_causes_state", sc_type.CONST_NODE_ROLE)
+                keynodes.rrel_causes_state
             )
             templ.triple(
-                ScKeynodes.resolve("concept_temp_state", sc_type.CONST_NODE_CLASS),
+                keynodes.concept_temp_state,
                 sc_type.VAR_PERM_POS_ARC,
                 "_state"
             )
@@ -285,19 +271,19 @@ class EditWeatherConditionsAgent(ScAgentClassic):
             templ.quintuple(
                 device,
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve(f"concept_temp_state_{get_interval(temp_min, temp_max, temp)}", sc_type.VAR_NODE_CLASS),
+                keynodes[f"concept_temp_state_{get_interval(temp_min, temp_max, temp)}"],
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("rrel_causes_state", sc_type.CONST_NODE_ROLE)
+                keynodes.rrel_causes_state
             )
 
             generate_by_template(templ)
             templ = ScTemplate()
             templ.quintuple(
-                ScKeynodes.resolve(f"concept_temp_state_{get_interval(temp_min, temp_max, temp)}", sc_type.VAR_NODE_CLASS),
+                keynodes[f"concept_temp_state_{get_interval(temp_min, temp_max, temp)}"],
                 sc_type.VAR_PERM_POS_ARC,
                 (sc_type.VAR_NODE, "_searched_state"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("rrel_is_opposite_to", sc_type.CONST_NODE_ROLE)
+                keynodes.rrel_is_opposite_to
             )
             search_results = search_by_template(templ)
             opposite_state = search_results[0].get("_searched_state")
@@ -307,7 +293,7 @@ class EditWeatherConditionsAgent(ScAgentClassic):
                 sc_type.VAR_PERM_POS_ARC,
                 opposite_state,
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("rrel_fixes_state", sc_type.CONST_NODE_ROLE)
+                keynodes.rrel_fixes_state
             )
             generate_by_template(templ)
 
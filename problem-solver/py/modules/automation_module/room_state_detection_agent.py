@@ -5,22 +5,18 @@ Distributed under the MIT License
 """
 
 import logging
-from typing import List, Tuple
-from sc_client.models import ScConstruction
-from sc_client.models import ScAddr, ScLinkContentType, ScLinkContent, ScTemplate
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from sc_client.models import ScAddr, ScLinkContentType, ScTemplate
 from sc_client.constants import sc_type
 from sc_client.client import (
     search_by_template,
-    generate_by_template, 
-    generate_elements,
-    erase_elements
+    get_link_content
 )
 
 from sc_kpm import ScAgentClassic, ScResult
-from sc_kpm.sc_sets import ScStructure
 from sc_kpm.utils import (
     generate_link,
-    get_link_content_data,
 )
 from sc_kpm.utils.action_utils import (
     finish_action_with_status,
@@ -28,15 +24,17 @@ from sc_kpm.utils.action_utils import (
     generate_action_result
 )
 
-from sc_kpm import ScKeynodes
+from ..common.keynodes import keynodes
 
 
-from datetime import datetime
-
-from .additions import (
+from ..common.additions import (
     get_interval,
-    get_middle
+    get_middle,
+    rooms_template
 )
+from ..common.custom_dataclasses import RoomState
+from .sensor_ingestion import sensor_store
+from .room_state_writer import RoomStateWriter
 
 
 logging.basicConfig(
@@ -44,6 +42,13 @@ logging.basicConfig(
 )
 
 
+SENSOR_CLASSES = {
+    "temp": "concept_temp_sensor",
+    "hum": "concept_humidity_sensor",
+    "co2": "concept_co2_sensor",
+}
+
+
 class RoomStateDetectionAgent(ScAgentClassic):
     def __init__(self):
         super().__init__("action_room_state_detection")
@@ -59,59 +64,40 @@ class RoomStateDetectionAgent(ScAgentClassic):
     def run(self, action_node: ScAddr) -> ScResult:
         self.logger.info("RoomStateDetectionAgent started")
         [room, house] = get_action_arguments(action_node, 2)
-        # rooms = self.get_rooms(house)
-        temp_link = self.get_sensors(room, ScKeynodes.resolve("concept_temp_sensor", sc_type.VAR_NODE_CLASS))
-        hum_link = self.get_sensors(room, ScKeynodes.resolve("concept_humidity_sensor", sc_type.VAR_NODE_CLASS))
-        co2_link = self.get_sensors(room, ScKeynodes.resolve("concept_co2_sensor", sc_type.VAR_NODE_CLASS))
-        self.delete_previous_measurement_data(room)
-        self.create_measurement(room, temp_link, hum_link, co2_link)
+        if not house.is_valid():
+            # action with a single argument refreshes every room of the house
+            house, room = room, ScAddr(0)
         user = self.get_user(house)
         temp_min, temp_max, hum_min, hum_max = self.get_preferences(user)
-        temp_state, hum_state, co2_state = self.get_state(room, temp=[temp_min, temp_max], hum=[hum_min, hum_max])
-        self.delete_previous_state(room)
-        temp = float(get_link_content_data(temp_link))
-        hum = float(get_link_content_data(hum_link))
-        co2 = float(get_link_content_data(co2_link))
-        if co2 < 800: co2 = 0.0
-        else: co2 = abs(co2 - 800) / 700
-        self.set_new_state(
-            room, 
-            temp_state, 
-            hum_state, 
-            co2_state, 
-            abs(temp - ((temp_max + temp_min) / 2)) / (temp_max - temp_min),
-            abs(hum - ((hum_max + hum_min) / 2)) / (hum_max - hum_min),
-            co2)
-
-        
+
+        readings = self.get_readings(house, room)
+        if not room.is_valid():
+            for missed_room in set(self.get_rooms(house)) - set(readings):
+                self.logger.warning("RoomStateDetectionAgent: room %s has no readings, skipped", missed_room.value)
+        if not readings:
+            return ScResult.ERROR
+
+        states = []
+        for room_addr, (temp, hum, co2) in readings.items():
+            states.append(self.get_state(room_addr, temp, hum, co2, temp=[temp_min, temp_max], hum=[hum_min, hum_max]))
+
+        RoomStateWriter().write(house, room, states)
+
         link = generate_link(
             "RoomStateDetectionAgent is called", ScLinkContentType.STRING, link_type=sc_type.CONST_NODE_LINK)
         generate_action_result(action_node, link)
-            
+
         return ScResult.OK
-    
 
-    def get_rooms(self, house: ScAddr) -> List[ScAddr]:
-        templ = ScTemplate()
-        templ.quintuple(
-            house,
-            sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE, "_set_rooms"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_rooms", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.triple(
-            "_set_rooms",
-            sc_type.VAR_PERM_POS_ARC,
-            (sc_type.VAR_NODE, "_room")
-        )
 
+    def get_rooms(self, house: ScAddr) -> List[ScAddr]:
+        templ, _ = rooms_template(house)
         search_results = search_by_template(templ)
         rooms = []
         for result in search_results:
             rooms.append(result.get("_room"))
         return rooms
-    
+
 
     def get_user(self, house: ScAddr) -> ScAddr:
         templ = ScTemplate()
@@ -120,12 +106,12 @@ class RoomStateDetectionAgent(ScAgentClassic):
             sc_type.VAR_PERM_POS_ARC,
             house,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_owner", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_owner
         )
 
         search_results = search_by_template(templ)
         return search_results[0].get("_user")
-    
+
 
     def get_preferences(self, user: ScAddr) -> Tuple[float, float, float, float]:
         templ = ScTemplate()
@@ -134,261 +120,71 @@ class RoomStateDetectionAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_prefs"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_prefs", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_prefs
         )
         templ.quintuple(
             "_prefs",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_temp_range"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp_range", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_temp_range
         )
         templ.quintuple(
             "_temp_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_temp_min"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_min", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_min
         )
         templ.quintuple(
             "_temp_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_temp_max"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_max", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_max
         )
         templ.quintuple(
             "_prefs",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_hum_range"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_humidity_range", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_humidity_range
         )
         templ.quintuple(
             "_hum_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_hum_min"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_min", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_min
         )
         templ.quintuple(
             "_hum_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_hum_max"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_max", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_max
         )
 
         search_results = search_by_template(templ)
         if not search_results:
             return -1, -1, -1, -1
-        return float(get_link_content_data(search_results[0].get("_temp_min"))), float(get_link_content_data(search_results[0].get("_temp_max"))), float(get_link_content_data(search_results[0].get("_hum_min"))), float(get_link_content_data(search_results[0].get("_hum_max"))),
-        
-    
-
-    def get_state(self, room: ScAddr, temp: List[float], hum: List[float]) -> Tuple[ScAddr, ScAddr, ScAddr]:
-        templ = ScTemplate()
-        templ.quintuple(
-            (sc_type.VAR_NODE, "_measurement"),
-            sc_type.VAR_ACTUAL_TEMP_POS_ARC,
-            room,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_current_measurement", sc_type.CONST_NODE_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE_LINK, "_temp_link"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE_LINK, "_hum_link"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE_LINK, "_co2_link"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_co2", sc_type.CONST_NODE_NON_ROLE)
-        )
-        search_results = search_by_template(templ)
-        co2_state = ScAddr(0)
-        if float(get_link_content_data(search_results[0].get("_co2_link"))) <= 800: co2_state = ScKeynodes.resolve("concept_co2_state_normal", sc_type.CONST_NODE_CLASS)
-        else: co2_state = ScKeynodes.resolve("concept_co2_state_high", sc_type.CONST_NODE_CLASS)
-        return ScKeynodes.resolve(f"concept_temp_state_{get_interval(l=temp[0], r=temp[1], value=float(get_link_content_data(search_results[0].get("_temp_link"))))}", sc_type.CONST_NODE_CLASS), ScKeynodes.resolve(f"concept_hum_state_{get_interval(l=hum[0], r=hum[1], value=float(get_link_content_data(search_results[0].get("_hum_link"))))}", sc_type.CONST_NODE_CLASS), co2_state
-
-
-    def delete_previous_state(self, room: ScAddr) -> None:
-        def is_relation(node: ScAddr) -> bool:
-            templ = ScTemplate()
-            templ.triple(
-                ScKeynodes.resolve("concept_relation", sc_type.CONST_NODE_CLASS),
-                sc_type.VAR_PERM_POS_ARC,
-                node
-            )
-            search_results = search_by_template(templ)
-            if not search_results: return False
-            else: return True
-
-        def is_state(node: ScAddr) -> bool:
-            templ = ScTemplate()
-            templ.triple(
-                ScKeynodes.resolve("concept_state", sc_type.CONST_NODE_CLASS),
-                sc_type.VAR_PERM_POS_ARC,
-                node
-            )
-            search_results = search_by_template(templ)
-            if not search_results: return False
-            else: return True
+        result = search_results[0]
+        contents = get_link_content(
+            result.get("_temp_min"), result.get("_temp_max"), result.get("_hum_min"), result.get("_hum_max"))
+        return tuple(float(content.data) for content in contents)
 
 
-        templ = ScTemplate()
-        templ.quintuple(
-            (sc_type.VAR_NODE, "_state"),
-            sc_type.VAR_ACTUAL_TEMP_POS_ARC,
-            room,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_current_state", sc_type.CONST_NODE_ROLE)
-        )
-        templ.quintuple(
-            "_state",
-            sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE, "_temp_state"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp_state", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_state",
-            sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE, "_hum_state"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum_state", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_state",
-            sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE, "_co2_state"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_co2_state", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_co2_state",
-            sc_type.VAR_COMMON_ARC,
-            sc_type.VAR_NODE_LINK,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_hum_state",
-            sc_type.VAR_COMMON_ARC,
-            sc_type.VAR_NODE_LINK,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_temp_state",
-            sc_type.VAR_COMMON_ARC,
-            sc_type.VAR_NODE_LINK,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
-        )
-
-
-        search_results = search_by_template(templ)
-        if not search_results:
-            return None
-        for i in range(len(search_results)):
-            element = search_results[0].get(i)
-            if element != room and not is_relation(element) and not is_state(element): erase_elements(element)
-        
-        return None
-    
-
-
-    def set_new_state(self, room: ScAddr, temp_state: ScAddr, hum_state: ScAddr, co2_state: ScAddr, temp_dev: float, hum_dev: float, co2_dev: float) -> None:
-        def generate_link_with_data(data: float) -> ScAddr:
-            construction = ScConstruction()
-            link_content = ScLinkContent(data, ScLinkContentType.FLOAT)
-            construction.generate_link(sc_type.CONST_NODE_LINK, link_content, 'link')
-            link = generate_elements(construction)[0]
-            return link
-        
-
-        temp_link = generate_link_with_data(temp_dev)
-        hum_link = generate_link_with_data(hum_dev)
-        co2_link = generate_link_with_data(co2_dev)
-
-        templ = ScTemplate()
-        templ.quintuple(
-            (sc_type.VAR_NODE, "_state"),
-            sc_type.VAR_ACTUAL_TEMP_POS_ARC,
-            room,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_current_state", sc_type.CONST_NODE_ROLE)
-        )
-        templ.quintuple(
-            "_state",
-            sc_type.VAR_COMMON_ARC,
-            temp_state,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp_state", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_state",
-            sc_type.VAR_COMMON_ARC,
-            hum_state,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum_state", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_state",
-            sc_type.VAR_COMMON_ARC,
-            co2_state,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_co2_state", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            temp_state,
-            sc_type.VAR_COMMON_ARC,
-            temp_link,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            hum_state,
-            sc_type.VAR_COMMON_ARC,
-            hum_link,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            co2_state,
-            sc_type.VAR_COMMON_ARC,
-            co2_link,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
-        )
-
-        generate_by_template(templ)
-
-
-
-    def get_sensors(self, room: ScAddr, type: ScAddr) -> Tuple[ScAddr, ScAddr, ScAddr]:
-        templ = ScTemplate()
+    def get_readings(self, house: ScAddr, room: ScAddr = ScAddr(0)) -> Dict[ScAddr, Tuple[float, float, float]]:
+        templ, room_param = rooms_template(house, room)
         templ.quintuple(
             (sc_type.VAR_NODE, "_sensor"),
             sc_type.VAR_PERM_POS_ARC,
-            room,
+            room_param,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_located_at", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_located_at
         )
         templ.triple(
-            type,
+            (sc_type.VAR_NODE_CLASS, "_sensor_class"),
             sc_type.VAR_PERM_POS_ARC,
             "_sensor"
         )
@@ -397,119 +193,55 @@ class RoomStateDetectionAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_link"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_readings", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_readings
         )
         search_results = search_by_template(templ)
-        readings = []
-        for result in search_results:
-            reading = result.get("_link")
-            readings.append(float(get_link_content_data(reading)))
-
-        construction = ScConstruction()
-        link_content = ScLinkContent(get_middle(readings), ScLinkContentType.FLOAT)
-        construction.generate_link(sc_type.CONST_NODE_LINK, link_content, 'link')
-        link = generate_elements(construction)[0]
-        return link
-    
-
-    
-    def delete_previous_measurement_data(self, room: ScAddr) -> None:
-        def is_relation(node: ScAddr) -> bool:
-            templ = ScTemplate()
-            templ.triple(
-                ScKeynodes.resolve("concept_relation", sc_type.CONST_NODE_CLASS),
-                sc_type.VAR_PERM_POS_ARC,
-                node
-            )
-            search_results = search_by_template(templ)
-            if not search_results: return False
-            else: return True
 
-        templ = ScTemplate()
-        templ.quintuple(
-            (sc_type.VAR_NODE, "_measurement"),
-            sc_type.VAR_ACTUAL_TEMP_POS_ARC,
-            room,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_current_measurement", sc_type.CONST_NODE_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            (sc_type.VAR_COMMON_ARC, "_arc1"),
-            (sc_type.VAR_NODE_LINK, "_link1"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_timestamp", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            (sc_type.VAR_COMMON_ARC, "_arc2"),
-            (sc_type.VAR_NODE_LINK, "_link2"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            (sc_type.VAR_COMMON_ARC, "_arc3"),
-            (sc_type.VAR_NODE_LINK, "_link3"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            (sc_type.VAR_COMMON_ARC, "_arc4"),
-            (sc_type.VAR_NODE_LINK, "_link4"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_co2", sc_type.CONST_NODE_NON_ROLE)
-        )
-
-        search_results = search_by_template(templ)
-        if not search_results: return None
-        for i in range(len(search_results)):
-            element = search_results[0].get(i)
-            if element != room and not is_relation(element): erase_elements(element)
-
-
-
-    def create_measurement(self, room: ScAddr, temp_link: ScAddr, hum_link: ScAddr, co2_link: ScAddr) -> None:
-        construction = ScConstruction()
-        link_content = ScLinkContent(datetime.now().isoformat(), ScLinkContentType.STRING)
-        construction.generate_link(sc_type.CONST_NODE_LINK, link_content, 'link')
-        link = generate_elements(construction)[0]
-        templ = ScTemplate()
-        templ.quintuple(
-            (sc_type.VAR_NODE, "_measurement"),
-            sc_type.VAR_ACTUAL_TEMP_POS_ARC,
-            room,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_current_measurement", sc_type.CONST_NODE_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            sc_type.VAR_COMMON_ARC,
-            link,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_timestamp", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            sc_type.VAR_COMMON_ARC, 
-            temp_link,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            sc_type.VAR_COMMON_ARC,
-            hum_link,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_measurement",
-            sc_type.VAR_COMMON_ARC,
-            co2_link,
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_co2", sc_type.CONST_NODE_NON_ROLE)
+        sensor_kinds = {keynodes[idtf]: kind for kind, idtf in SENSOR_CLASSES.items()}
+        values = defaultdict(lambda: defaultdict(list))
+        rows = []
+        streamed = set()
+        for result in search_results:
+            kind = sensor_kinds.get(result.get("_sensor_class"))
+            if kind is None:
+                continue
+            sensor = result.get("_sensor")
+            # sensors fed by the ingestion pipeline are read from memory
+            mean = sensor_store.mean(sensor)
+            if mean is None:
+                rows.append((result.get("_room"), kind, result.get("_link")))
+            elif sensor not in streamed:
+                streamed.add(sensor)
+                values[result.get("_room")][kind].append(mean)
+
+        if rows:
+            contents = get_link_content(*[link for _, _, link in rows])
+            for (room_addr, kind, _), content in zip(rows, contents):
+                values[room_addr][kind].append(float(content.data))
+
+        readings = {}
+        for room_addr, kinds in values.items():
+            if len(kinds) < len(SENSOR_CLASSES):
+                self.logger.warning("RoomStateDetectionAgent: room %s misses some sensor kinds, skipped", room_addr.value)
+                continue
+            readings[room_addr] = (get_middle(kinds["temp"]), get_middle(kinds["hum"]), get_middle(kinds["co2"]))
+        return readings
+
+
+    def get_state(self, room: ScAddr, temp_value: float, hum_value: float, co2_value: float, temp: List[float], hum: List[float]) -> RoomState:
+        temp_interval = get_interval(l=temp[0], r=temp[1], value=temp_value)
+        hum_interval = get_interval(l=hum[0], r=hum[1], value=hum_value)
+        if co2_value <= 800: co2_state = keynodes.concept_co2_state_normal
+        else: co2_state = keynodes.concept_co2_state_high
+        return RoomState(
+            room=room,
+            temp=temp_value,
+            hum=hum_value,
+            co2=co2_value,
+            temp_state=keynodes[f"concept_temp_state_{temp_interval}"],
+            hum_state=keynodes[f"concept_hum_state_{hum_interval}"],
+            co2_state=co2_state,
+            temp_dev=abs(temp_value - ((temp[1] + temp[0]) / 2)) / (temp[1] - temp[0]),
+            hum_dev=abs(hum_value - ((hum[1] + hum[0]) / 2)) / (hum[1] - hum[0]),
+            co2_dev=0.0 if co2_value < 800 else abs(co2_value - 800) / 700,
         )
-
-        generate_by_template(templ)
\ No newline at end of file
@@ -0,0 +1,259 @@
+"""
+This source file is part of an OSTIS project. For the latest info, see http://ostis.net
+Distributed under the MIT License
+(See accompanying file COPYING.MIT or copy at http://opensource.org/licenses/MIT)
+"""
+
+import logging
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+from sc_client.models import ScAddr, ScConstruction, ScLinkContent, ScLinkContentType
+from sc_client.constants import sc_type
+from sc_client.client import (
+    search_by_template,
+    generate_elements,
+    get_link_content,
+    set_link_contents
+)
+
+from ..common.keynodes import keynodes
+from ..common.structure_gc import StructureCollector
+
+from ..common.additions import rooms_template
+from ..common.custom_dataclasses import RoomState
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+
+KINDS = ("temp", "hum", "co2")
+
+
+@dataclass
+class StoredStructure:
+    node: ScAddr = field(default_factory=lambda: ScAddr(0))
+    # kind -> (link, value) for measurements, kind -> (class, class arc, deviation link, deviation) for states
+    parts: Dict[str, Tuple] = field(default_factory=dict)
+
+
+def is_same(stored: float, value: float) -> bool:
+    # link contents are kept as sc-memory floats, so exact equality is too strict
+    return math.isclose(stored, value, rel_tol=1e-6, abs_tol=1e-9)
+
+
+class RoomStateWriter:
+    """Brings the current measurement and state structures of rooms up to date.
+
+    Stored structures are read with two template searches and compared with the
+    new values. Only what differs is written: changed values are rewritten in
+    place with one set_link_contents call, outdated state classes and missing
+    structures go through one bulk erase and one generate_elements call.
+    Rooms whose values did not change cost no writes at all.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._erase = StructureCollector()
+        self._contents: List[ScLinkContent] = []
+        self._construction = ScConstruction()
+
+    def write(self, house: ScAddr, room: ScAddr, states: List[RoomState]) -> None:
+        measurements = self.get_measurements(house, room)
+        stored_states = self.get_states(house, room)
+        self.read_values(measurements, stored_states)
+
+        timestamp = datetime.now().isoformat()
+        for i, state in enumerate(states):
+            self.update_measurement(f"measurement_{i}", state, measurements.get(state.room), timestamp)
+            self.update_state(f"state_{i}", state, stored_states.get(state.room))
+
+        erased = self._erase.erase()
+        if self._contents:
+            set_link_contents(*self._contents)
+        if self._construction.commands:
+            generate_elements(self._construction)
+        self.logger.info(
+            "Room states written: %d erased, %d values changed, %d elements generated",
+            erased, len(self._contents), len(self._construction.commands))
+
+
+    def get_measurements(self, house: ScAddr, room: ScAddr) -> Dict[ScAddr, StoredStructure]:
+        relations = {keynodes[f"nrel_{kind}"]: kind for kind in KINDS + ("timestamp",)}
+        templ, room_param = rooms_template(house, room)
+        templ.quintuple(
+            (sc_type.VAR_NODE, "_measurement"),
+            sc_type.VAR_ACTUAL_TEMP_POS_ARC,
+            room_param,
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.rrel_current_measurement
+        )
+        templ.quintuple(
+            "_measurement",
+            sc_type.VAR_COMMON_ARC,
+            (sc_type.VAR_NODE_LINK, "_link"),
+            sc_type.VAR_PERM_POS_ARC,
+            (sc_type.VAR_NODE_NON_ROLE, "_relation")
+        )
+        measurements = {}
+        for result in search_by_template(templ):
+            kind = relations.get(result.get("_relation"))
+            if kind is None:
+                continue
+            measurement = measurements.setdefault(result.get("_room"), StoredStructure(result.get("_measurement")))
+            measurement.parts[kind] = (result.get("_link"), None)
+        return measurements
+
+
+    def get_states(self, house: ScAddr, room: ScAddr) -> Dict[ScAddr, StoredStructure]:
+        relations = {keynodes[f"nrel_{kind}_state"]: kind for kind in KINDS}
+        templ, _ = self.states_template(house, room)
+        states = {}
+        for result in search_by_template(templ):
+            kind = relations.get(result.get("_relation"))
+            if kind is None:
+                continue
+            state = states.setdefault(result.get("_room"), StoredStructure(result.get("_state")))
+            if state.node != result.get("_state"):
+                # a room has one current state, extra ones are left from failed or legacy writes
+                self._erase.add(result.get("_state"))
+                continue
+            state.parts[kind] = (result.get("_class"), result.get("_class_arc"), None, None)
+
+        templ.quintuple(
+            "_class",
+            sc_type.VAR_COMMON_ARC,
+            (sc_type.VAR_NODE_LINK, "_deviation"),
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.nrel_deviation
+        )
+        templ.triple(
+            "_state",
+            sc_type.VAR_PERM_POS_ARC,
+            "_deviation"
+        )
+        for result in search_by_template(templ):
+            state = states.get(result.get("_room"))
+            kind = relations.get(result.get("_relation"))
+            if state is None or kind not in state.parts:
+                continue
+            if state.node == result.get("_state"):
+                state.parts[kind] = state.parts[kind][:2] + (result.get("_deviation"), None)
+            else:
+                self._erase.add(result.get("_deviation"))
+
+        # states written before they owned their deviations are rewritten as a whole. Their
+        # deviation links hang off the shared state classes and can't be told apart by room,
+        # so they are kept for rooms of houses that are not migrated yet
+        for state in states.values():
+            for kind, (_, _, deviation_link, _) in list(state.parts.items()):
+                if deviation_link is None:
+                    del state.parts[kind]
+        return states
+
+
+    def states_template(self, house: ScAddr, room: ScAddr):
+        templ, room_param = rooms_template(house, room)
+        templ.quintuple(
+            (sc_type.VAR_NODE, "_state"),
+            sc_type.VAR_ACTUAL_TEMP_POS_ARC,
+            room_param,
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.rrel_current_state
+        )
+        templ.quintuple(
+            "_state",
+            (sc_type.VAR_COMMON_ARC, "_class_arc"),
+            (sc_type.VAR_NODE_CLASS, "_class"),
+            sc_type.VAR_PERM_POS_ARC,
+            (sc_type.VAR_NODE_NON_ROLE, "_relation")
+        )
+        return templ, room_param
+
+
+    def read_values(self, measurements: Dict[ScAddr, StoredStructure], states: Dict[ScAddr, StoredStructure]) -> None:
+        targets = []
+        for measurement in measurements.values():
+            for kind, (link, _) in measurement.parts.items():
+                if kind != "timestamp":
+                    targets.append((measurement, kind, link))
+        for state in states.values():
+            for kind, (_, _, link, _) in state.parts.items():
+                targets.append((state, kind, link))
+        if not targets:
+            return
+        contents = get_link_content(*[link for _, _, link in targets])
+        for (structure, kind, _), content in zip(targets, contents):
+            *part, _ = structure.parts[kind]
+            structure.parts[kind] = (*part, float(content.data))
+
+
+    def update_measurement(self, alias: str, state: RoomState, stored: Union[StoredStructure, None], timestamp: str) -> None:
+        values = {"temp": state.temp, "hum": state.hum, "co2": state.co2}
+        if stored is None or len(stored.parts) < len(KINDS) + 1:
+            if stored is not None:
+                self._erase.add(stored.node)
+                self._erase.add(*[link for link, _ in stored.parts.values()])
+            self.add_owner(alias, state.room, keynodes.rrel_current_measurement)
+            self.add_value(alias, f"{alias}_timestamp", keynodes.nrel_timestamp, timestamp, ScLinkContentType.STRING)
+            for kind in KINDS:
+                self.add_value(alias, f"{alias}_{kind}", keynodes[f"nrel_{kind}"], values[kind], ScLinkContentType.FLOAT)
+            return
+
+        changed = False
+        for kind in KINDS:
+            link, value = stored.parts[kind]
+            if not is_same(value, values[kind]):
+                self._contents.append(ScLinkContent(values[kind], ScLinkContentType.FLOAT, addr=link))
+                changed = True
+        if changed:
+            self._contents.append(ScLinkContent(timestamp, ScLinkContentType.STRING, addr=stored.parts["timestamp"][0]))
+
+
+    def update_state(self, alias: str, state: RoomState, stored: Union[StoredStructure, None]) -> None:
+        new_parts = {
+            "temp": (state.temp_state, state.temp_dev),
+            "hum": (state.hum_state, state.hum_dev),
+            "co2": (state.co2_state, state.co2_dev),
+        }
+        if stored is None or len(stored.parts) < len(KINDS):
+            if stored is not None:
+                self._erase.add(stored.node)
+                self._erase.add(*[deviation_link for _, _, deviation_link, _ in stored.parts.values()])
+            self.add_owner(alias, state.room, keynodes.rrel_current_state)
+            for kind, (class_node, deviation) in new_parts.items():
+                self.add_state_class(alias, kind, class_node, deviation)
+            return
+
+        for kind, (class_node, deviation) in new_parts.items():
+            stored_class, class_arc, deviation_link, stored_deviation = stored.parts[kind]
+            if stored_class != class_node:
+                # the deviation link hangs off the class, so it moves together with it
+                self._erase.add(class_arc, deviation_link)
+                self.add_state_class(stored.node, kind, class_node, deviation, alias=f"{alias}_{kind}")
+            elif not is_same(stored_deviation, deviation):
+                self._contents.append(ScLinkContent(deviation, ScLinkContentType.FLOAT, addr=deviation_link))
+
+
+    def add_owner(self, owner: str, room: ScAddr, role: ScAddr) -> None:
+        self._construction.generate_node(sc_type.CONST_NODE, owner)
+        self._construction.generate_connector(sc_type.CONST_ACTUAL_TEMP_POS_ARC, owner, room, f"{owner}_arc")
+        self._construction.generate_connector(sc_type.CONST_PERM_POS_ARC, role, f"{owner}_arc")
+
+
+    def add_value(self, owner: Union[str, ScAddr], alias: str, relation: ScAddr, value: Union[float, str], value_type: ScLinkContentType) -> None:
+        self._construction.generate_link(sc_type.CONST_NODE_LINK, ScLinkContent(value, value_type), alias)
+        self._construction.generate_connector(sc_type.CONST_COMMON_ARC, owner, alias, f"{alias}_arc")
+        self._construction.generate_connector(sc_type.CONST_PERM_POS_ARC, relation, f"{alias}_arc")
+
+
+    def add_state_class(self, state: Union[str, ScAddr], kind: str, class_node: ScAddr, deviation: float, alias: str = None) -> None:
+        alias = alias or f"{state}_{kind}"
+        self._construction.generate_connector(sc_type.CONST_COMMON_ARC, state, class_node, f"{alias}_arc")
+        self._construction.generate_connector(sc_type.CONST_PERM_POS_ARC, keynodes[f"nrel_{kind}_state"], f"{alias}_arc")
+        self.add_value(class_node, f"{alias}_deviation", keynodes.nrel_deviation, deviation, ScLinkContentType.FLOAT)
+        # the state owns its deviation links so they can be found and erased with it
+        self._construction.generate_connector(sc_type.CONST_PERM_POS_ARC, state, f"{alias}_deviation")
@@ -0,0 +1,276 @@
+"""
+This source file is part of an OSTIS project. For the latest info, see http://ostis.net
+Distributed under the MIT License
+(See accompanying file COPYING.MIT or copy at http://opensource.org/licenses/MIT)
+"""
+
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Dict, Iterator, Optional
+
+from sc_client.models import ScAddr, ScLinkContent, ScLinkContentType, ScTemplate
+from sc_client.constants import sc_type
+from sc_client.client import erase_elements, search_by_template, set_link_contents
+
+from sc_kpm import ScKeynodes
+from sc_kpm.utils import generate_link, generate_binary_relation
+
+from ..common.keynodes import keynodes
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+
+class SensorWindow:
+    """Fixed-size window of the latest readings of one sensor.
+
+    Mean, min, max and the least-squares trend (change per reading) are all
+    maintained incrementally, so every query is O(1).
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._values = array("d", bytes(8 * size))
+        self._count = 0
+        self._next = 0
+        # x coordinates of the trend are counted from this reading
+        self._base = 0
+        self._sum = 0.0
+        self._xy_sum = 0.0
+        self._min = deque()
+        self._max = deque()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def push(self, value: float) -> None:
+        seq = self._next
+        pos = seq % self._size
+        if self._count == self._size:
+            old = self._values[pos]
+            self._sum -= old
+            self._xy_sum -= (seq - self._size - self._base) * old
+        else:
+            self._count += 1
+        self._values[pos] = value
+        self._sum += value
+        self._xy_sum += (seq - self._base) * value
+
+        while self._min and self._min[-1][1] >= value: self._min.pop()
+        while self._max and self._max[-1][1] <= value: self._max.pop()
+        self._min.append((seq, value))
+        self._max.append((seq, value))
+        while self._min[0][0] <= seq - self._size: self._min.popleft()
+        while self._max[0][0] <= seq - self._size: self._max.popleft()
+
+        self._next += 1
+        if pos == self._size - 1:
+            self._resync()
+
+    def _resync(self) -> None:
+        # once per lap: drop accumulated rounding error and keep x small
+        first = self._next - self._count
+        values = [self._values[seq % self._size] for seq in range(first, self._next)]
+        self._base = first
+        self._sum = math.fsum(values)
+        self._xy_sum = math.fsum(i * value for i, value in enumerate(values))
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self._count if self._count else 0.0
+
+    @property
+    def min(self) -> float:
+        return self._min[0][1] if self._min else 0.0
+
+    @property
+    def max(self) -> float:
+        return self._max[0][1] if self._max else 0.0
+
+    @property
+    def trend(self) -> float:
+        n = self._count
+        if n < 2:
+            return 0.0
+        a = self._next - n - self._base
+        x_sum = n * a + n * (n - 1) / 2
+        xx_sum = n * a * a + a * n * (n - 1) + (n - 1) * n * (2 * n - 1) / 6
+        return (n * self._xy_sum - x_sum * self._sum) / (n * xx_sum - x_sum * x_sum)
+
+
+class SensorStore:
+    def __init__(self, window_size: int = 60):
+        self.window_size = window_size
+        self._windows: Dict[ScAddr, SensorWindow] = {}
+        self._lock = threading.Lock()
+
+    def push(self, sensor: ScAddr, value: float) -> None:
+        with self._lock:
+            window = self._windows.get(sensor)
+            if window is None:
+                window = self._windows[sensor] = SensorWindow(self.window_size)
+            window.push(value)
+
+    def get(self, sensor: ScAddr) -> Optional[SensorWindow]:
+        return self._windows.get(sensor)
+
+    def mean(self, sensor: ScAddr) -> Optional[float]:
+        with self._lock:
+            window = self._windows.get(sensor)
+            return window.mean if window else None
+
+    def means(self) -> Dict[ScAddr, float]:
+        with self._lock:
+            return {sensor: window.mean for sensor, window in self._windows.items()}
+
+
+sensor_store = SensorStore()
+
+
+def read_udp(address: str) -> Iterator[str]:
+    host, port = address.rsplit(":", 1)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, int(port)))
+    while True:
+        data, _ = sock.recvfrom(65536)
+        yield from data.decode("utf-8", errors="ignore").splitlines()
+
+
+def read_file_tail(path: str, poll_interval: float = 0.5) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as file:
+        file.seek(0, os.SEEK_END)
+        while True:
+            line = file.readline()
+            if not line:
+                time.sleep(poll_interval)
+                continue
+            yield line
+
+
+class SensorIngestion:
+    """Collects pushed readings into the sensor store and publishes the means.
+
+    Every line of the source is `<sensor system identifier> <value>`. Sources
+    are `udp://host:port` or a path to a file that is followed like `tail -f`.
+    A sensor's nrel_readings link is rewritten only when its mean moved by at
+    least `threshold` since the last publication. Sensors are resolved once per
+    identifier, unknown identifiers are looked up again after `retry_unknown` seconds.
+    """
+
+    # unknown identifiers are forgotten above this count, so garbage input can't grow the cache
+    MAX_UNKNOWN = 10000
+
+    def __init__(self, source: str, store: SensorStore = sensor_store, threshold: float = 0.1, publish_interval: float = 1.0,
+                 retry_unknown: float = 60.0):
+        self.source = source
+        self.store = store
+        self.threshold = threshold
+        self.publish_interval = publish_interval
+        self.retry_unknown = retry_unknown
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._published: Dict[ScAddr, float] = {}
+        self._links: Dict[ScAddr, ScAddr] = {}
+        self._sensors: Dict[str, ScAddr] = {}
+        self._unknown: Dict[str, float] = {}
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._read, name="sensor-ingestion-reader", daemon=True).start()
+        threading.Thread(target=self._publish_loop, name="sensor-ingestion-publisher", daemon=True).start()
+        self.logger.info("Sensor ingestion started from %s", self.source)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _lines(self) -> Iterator[str]:
+        if self.source.startswith("udp://"):
+            return read_udp(self.source[len("udp://"):])
+        return read_file_tail(self.source)
+
+    def _read(self) -> None:
+        for line in self._lines():
+            if self._stop.is_set():
+                break
+            parts = line.split()
+            if len(parts) != 2:
+                continue
+            try:
+                value = float(parts[1])
+            except ValueError:
+                self.logger.warning("Bad sensor reading: %s", line.strip())
+                continue
+            sensor = self.resolve_sensor(parts[0])
+            if sensor is not None:
+                self.store.push(sensor, value)
+
+    def resolve_sensor(self, idtf: str) -> Optional[ScAddr]:
+        sensor = self._sensors.get(idtf)
+        if sensor is not None:
+            return sensor
+        now = time.monotonic()
+        unknown_since = self._unknown.get(idtf)
+        if unknown_since is not None and now - unknown_since < self.retry_unknown:
+            return None
+
+        sensor = ScKeynodes.get(idtf)
+        if not sensor.is_valid():
+            if unknown_since is None:
+                self.logger.warning("Unknown sensor: %s", idtf)
+                if len(self._unknown) >= self.MAX_UNKNOWN:
+                    self._unknown.clear()
+            self._unknown[idtf] = now
+            return None
+        self._unknown.pop(idtf, None)
+        self._sensors[idtf] = sensor
+        return sensor
+
+    def _publish_loop(self) -> None:
+        while not self._stop.wait(self.publish_interval):
+            try:
+                self.publish()
+            except Exception as e:
+                self.logger.error("Failed to publish sensor readings: %s", e)
+
+    def publish(self) -> None:
+        contents = []
+        for sensor, mean in self.store.means().items():
+            published = self._published.get(sensor)
+            if published is not None and abs(mean - published) < self.threshold:
+                continue
+            link = self._links.get(sensor) or self.find_readings_link(sensor)
+            if link is None:
+                link = generate_link(mean, ScLinkContentType.FLOAT, link_type=sc_type.CONST_NODE_LINK)
+                generate_binary_relation(sc_type.CONST_COMMON_ARC, sensor, link, keynodes.nrel_readings)
+            else:
+                contents.append(ScLinkContent(mean, ScLinkContentType.FLOAT, addr=link))
+            self._links[sensor] = link
+            self._published[sensor] = mean
+        if contents:
+            set_link_contents(*contents)
+
+    def find_readings_link(self, sensor: ScAddr) -> Optional[ScAddr]:
+        templ = ScTemplate()
+        templ.quintuple(
+            sensor,
+            sc_type.VAR_COMMON_ARC,
+            (sc_type.VAR_NODE_LINK, "_link"),
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.nrel_readings
+        )
+        search_results = search_by_template(templ)
+        if not search_results:
+            return None
+        links = list(dict.fromkeys(result.get("_link") for result in search_results))
+        if len(links) > 1:
+            # readers take any of the links, so extra ones would keep stale readings
+            self.logger.info("Erasing %d extra readings links of a sensor", len(links) - 1)
+            erase_elements(*links[1:])
+        return links[0]
@@ -0,0 +1,197 @@
+"""
+This source file is part of an OSTIS project. For the latest info, see http://ostis.net
+Distributed under the MIT License
+(See accompanying file COPYING.MIT or copy at http://opensource.org/licenses/MIT)
+"""
+
+import bisect
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+
+PYOWM_TOKEN = os.environ.get("PYOWM_TOKEN", "7ae68ffd9ddbe0af23386477fdd4c611")
+
+
+@dataclass
+class WeatherObservation:
+    status: str = ""
+    temp: float = -1000
+    hum: float = -1000
+    timestamp: float = field(default_factory=time.time)
+
+
+def normalize_location(location: str) -> str:
+    return " ".join(location.split()).casefold()
+
+
+class WeatherProvider(ABC):
+    @abstractmethod
+    def get(self, location: str) -> Optional[WeatherObservation]:
+        ...
+
+
+class OwmWeatherProvider(WeatherProvider):
+    def __init__(self, token: str = PYOWM_TOKEN, language: str = "en"):
+        from pyowm import OWM
+        from pyowm.utils.config import get_default_config
+
+        config_dict = get_default_config()
+        config_dict['language'] = language
+        # the client keeps its HTTP session, so it is shared by all requests
+        self._weather_manager = OWM(token, config_dict).weather_manager()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def get(self, location: str) -> Optional[WeatherObservation]:
+        try:
+            weather = self._weather_manager.weather_at_place(location).weather
+        except Exception as e:
+            self.logger.info("OwmWeatherProvider has some problems with pyowm: %s", e)
+            return None
+        return WeatherObservation(
+            status=weather.status.lower(),
+            temp=weather.temperature("celsius")['temp'],
+            hum=weather.humidity,
+            timestamp=weather.reference_time() or time.time(),
+        )
+
+
+class StubWeatherProvider(WeatherProvider):
+    def __init__(self, observations: Dict[str, WeatherObservation] = None):
+        self.observations = {normalize_location(location): observation for location, observation in (observations or {}).items()}
+
+    def get(self, location: str) -> Optional[WeatherObservation]:
+        return self.observations.get(normalize_location(location))
+
+
+def parse_timestamp(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+class ReplayWeatherProvider(WeatherProvider):
+    """Replays recorded observations from a CSV or JSONL file.
+
+    Every record has `location`, `timestamp` (unix seconds or ISO 8601),
+    `status`, `temp` and `hum`. Replay time starts at the earliest record and
+    runs `speed` times faster than the wall clock; a location gets its latest
+    record not newer than the replay time. With `speed` 0 every request for a
+    location returns its next record instead, which makes runs fully
+    deterministic.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True):
+        self.speed = speed
+        self.loop = loop
+        self._records: Dict[str, List[WeatherObservation]] = defaultdict(list)
+        for record in self.read_records(path):
+            observation = WeatherObservation(
+                status=str(record["status"]).lower(),
+                temp=float(record["temp"]),
+                hum=float(record["hum"]),
+                timestamp=parse_timestamp(record["timestamp"]),
+            )
+            self._records[normalize_location(record["location"])].append(observation)
+        for observations in self._records.values():
+            observations.sort(key=lambda observation: observation.timestamp)
+        self._timestamps = {location: [o.timestamp for o in observations] for location, observations in self._records.items()}
+        timestamps = [t[0] for t in self._timestamps.values() if t]
+        self._first = min(timestamps) if timestamps else 0.0
+        self._last = max((t[-1] for t in self._timestamps.values() if t), default=0.0)
+        self._started = time.monotonic()
+        self._positions: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def read_records(path: str) -> List[dict]:
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            if path.endswith(".jsonl"):
+                return [json.loads(line) for line in file if line.strip()]
+            return list(csv.DictReader(file))
+
+    def replay_time(self) -> float:
+        elapsed = (time.monotonic() - self._started) * self.speed
+        span = self._last - self._first
+        if self.loop and span > 0:
+            elapsed %= span + 1
+        return self._first + elapsed
+
+    def get(self, location: str) -> Optional[WeatherObservation]:
+        key = normalize_location(location)
+        observations = self._records.get(key)
+        if not observations:
+            return None
+        if self.speed == 0:
+            with self._lock:
+                position = self._positions[key]
+                if position >= len(observations):
+                    if not self.loop:
+                        return observations[-1]
+                    position = 0
+                self._positions[key] = position + 1
+            return observations[position]
+        index = bisect.bisect_right(self._timestamps[key], self.replay_time()) - 1
+        return observations[max(index, 0)]
+
+
+class CachedWeatherProvider(WeatherProvider):
+    """Keeps observations per normalized location for `ttl` seconds.
+
+    Concurrent requests for a location that is not cached wait for the single
+    upstream fetch started by the first of them.
+    """
+
+    def __init__(self, provider: WeatherProvider, ttl: float = 600.0):
+        self.provider = provider
+        self.ttl = ttl
+        self._cache: Dict[str, Tuple[float, WeatherObservation]] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, location: str) -> Optional[WeatherObservation]:
+        key = normalize_location(location)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = self._in_flight[key] = Future()
+        if not is_owner:
+            return future.result()
+
+        observation = None
+        try:
+            observation = self.provider.get(location)
+        finally:
+            with self._lock:
+                # failures are not cached, the next action retries
+                if observation is not None:
+                    self._cache[key] = (time.monotonic() + self.ttl, observation)
+                del self._in_flight[key]
+            future.set_result(observation)
+        return observation
+
+    def invalidate(self, location: str = None) -> None:
+        with self._lock:
+            if location is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(normalize_location(location), None)
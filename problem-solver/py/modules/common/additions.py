@@ -0,0 +1,38 @@
+from typing import List, Tuple, Union
+from sc_client.models import ScAddr, ScTemplate
+from sc_client.constants import sc_type
+from .keynodes import keynodes
+
+def get_middle(numbers: List[float]) -> float:
+    middle: float = 0.0
+    for num in numbers:
+        middle += num
+    
+    return middle / len(numbers)
+
+
+
+def get_interval(l: float, r: float, value: float) -> str:
+    if value < l: return "low"
+    if value > r: return "high"
+    return "normal"
+
+
+def rooms_template(house: ScAddr, room: ScAddr = ScAddr(0)) -> Tuple[ScTemplate, Union[str, Tuple[ScAddr, str]]]:
+    """Start a template over `room` or, if it is not given, over every room of `house` (aliased as `_room`)."""
+    templ = ScTemplate()
+    if room.is_valid():
+        return templ, room >> "_room"
+    templ.quintuple(
+        house,
+        sc_type.VAR_COMMON_ARC,
+        (sc_type.VAR_NODE, "_set_rooms"),
+        sc_type.VAR_PERM_POS_ARC,
+        keynodes.nrel_rooms
+    )
+    templ.triple(
+        "_set_rooms",
+        sc_type.VAR_PERM_POS_ARC,
+        (sc_type.VAR_NODE, "_room")
+    )
+    return templ, "_room"
@@ -0,0 +1,40 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+from sc_client.models import ScAddr
+
+@dataclass
+class Problem:
+    problem: ScAddr = field(default_factory=lambda: ScAddr(0))
+    problem_coefficient: float = 0.0
+
+    def __init__(self, problem: ScAddr = None, problem_coefficient: int = 0):
+        self.problem = problem if problem is not None else ScAddr(0)
+        self.problem_coefficient: float = problem_coefficient
+
+
+@dataclass
+class RoomState:
+    room: ScAddr = field(default_factory=lambda: ScAddr(0))
+    temp: float = 0.0
+    hum: float = 0.0
+    co2: float = 0.0
+    temp_state: ScAddr = field(default_factory=lambda: ScAddr(0))
+    hum_state: ScAddr = field(default_factory=lambda: ScAddr(0))
+    co2_state: ScAddr = field(default_factory=lambda: ScAddr(0))
+    temp_dev: float = 0.0
+    hum_dev: float = 0.0
+    co2_dev: float = 0.0
+
+
+@dataclass
+class RoomPlan:
+    room: ScAddr = field(default_factory=lambda: ScAddr(0))
+    problems: List[Problem] = field(default_factory=list)
+    normals: List[ScAddr] = field(default_factory=list)
+    turn_off: List[ScAddr] = field(default_factory=list)
+    turn_on: List[ScAddr] = field(default_factory=list)
+    score: Optional[float] = None
+
+    @property
+    def has_state(self) -> bool:
+        return bool(self.problems or self.normals)
@@ -0,0 +1,132 @@
+"""
+This source file is part of an OSTIS project. For the latest info, see http://ostis.net
+Distributed under the MIT License
+(See accompanying file COPYING.MIT or copy at http://opensource.org/licenses/MIT)
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Set
+
+from sc_client.models import ScAddr, ScTemplate, ScEventSubscriptionParams
+from sc_client.constants import sc_type
+from sc_client.constants.common import ScEventType
+from sc_client.client import (
+    search_by_template,
+    create_elementary_event_subscriptions,
+    destroy_elementary_event_subscriptions
+)
+
+from .keynodes import keynodes
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+
+class DeviceCapabilityIndex:
+    """In-process map of what devices can fix or cause.
+
+    Keeps device class -> states fixed/caused (rrel_fixes_state,
+    rrel_causes_state) and device -> classes. The whole index is rebuilt with
+    three relation-wide searches, lazily on the first lookup after the
+    knowledge base changed: events on the two roles and on concept_device
+    mark it dirty.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._fixes: Dict[ScAddr, FrozenSet[ScAddr]] = {}
+        self._causes: Dict[ScAddr, FrozenSet[ScAddr]] = {}
+        self._device_classes: Dict[ScAddr, List[ScAddr]] = {}
+        self._dirty = True
+        self._lock = threading.RLock()
+        self._subscriptions = []
+
+    def subscribe(self) -> None:
+        """(Re)subscribe to the knowledge base changes, e.g. after a reconnect."""
+        self._subscriptions = create_elementary_event_subscriptions(*[
+            ScEventSubscriptionParams(addr, event_type, self.on_change)
+            for addr in (keynodes.rrel_fixes_state, keynodes.rrel_causes_state, keynodes.concept_device)
+            for event_type in (ScEventType.AFTER_GENERATE_OUTGOING_ARC, ScEventType.BEFORE_ERASE_OUTGOING_ARC)
+        ])
+        self.invalidate()
+
+    def unsubscribe(self) -> None:
+        if self._subscriptions:
+            destroy_elementary_event_subscriptions(*self._subscriptions)
+        self._subscriptions = []
+
+    def on_change(self, *_: ScAddr) -> None:
+        self._dirty = True
+
+    def invalidate(self) -> None:
+        self._dirty = True
+
+    def refresh(self) -> None:
+        fixes = self._search_states(keynodes.rrel_fixes_state)
+        causes = self._search_states(keynodes.rrel_causes_state)
+
+        templ = ScTemplate()
+        templ.triple(
+            keynodes.concept_device,
+            sc_type.VAR_PERM_POS_ARC,
+            (sc_type.VAR_NODE, "_device")
+        )
+        templ.triple(
+            (sc_type.VAR_NODE_CLASS, "_device_class"),
+            sc_type.VAR_PERM_POS_ARC,
+            "_device"
+        )
+        device_classes = defaultdict(list)
+        for result in search_by_template(templ):
+            device_classes[result.get("_device")].append(result.get("_device_class"))
+
+        with self._lock:
+            self._fixes = {device_class: frozenset(states) for device_class, states in fixes.items()}
+            self._causes = {device_class: frozenset(states) for device_class, states in causes.items()}
+            self._device_classes = dict(device_classes)
+        self.logger.info("Device capabilities indexed: %d devices, %d device classes",
+                         len(self._device_classes), len(set(self._fixes) | set(self._causes)))
+
+    def _search_states(self, role: ScAddr) -> Dict[ScAddr, Set[ScAddr]]:
+        templ = ScTemplate()
+        templ.quintuple(
+            (sc_type.VAR_NODE_CLASS, "_device_class"),
+            sc_type.VAR_PERM_POS_ARC,
+            (sc_type.VAR_NODE, "_state"),
+            sc_type.VAR_PERM_POS_ARC,
+            role
+        )
+        states = defaultdict(set)
+        for result in search_by_template(templ):
+            states[result.get("_device_class")].add(result.get("_state"))
+        return states
+
+    def _ensure_fresh(self, device: ScAddr) -> None:
+        with self._lock:
+            # an unknown device means the index missed a change
+            if self._dirty or device not in self._device_classes:
+                self._dirty = False
+                self.refresh()
+
+    def classes(self, device: ScAddr) -> List[ScAddr]:
+        self._ensure_fresh(device)
+        return self._device_classes.get(device, [])
+
+    def fixes(self, device: ScAddr) -> FrozenSet[ScAddr]:
+        return self._collect(device, self._fixes)
+
+    def causes(self, device: ScAddr) -> FrozenSet[ScAddr]:
+        return self._collect(device, self._causes)
+
+    def _collect(self, device: ScAddr, states: Dict[ScAddr, FrozenSet[ScAddr]]) -> FrozenSet[ScAddr]:
+        result = frozenset()
+        for device_class in self.classes(device):
+            result |= states.get(device_class, frozenset())
+        return result
+
+
+device_capabilities = DeviceCapabilityIndex()
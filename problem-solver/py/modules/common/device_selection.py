@@ -0,0 +1,129 @@
+"""
+This source file is part of an OSTIS project. For the latest info, see http://ostis.net
+Distributed under the MIT License
+(See accompanying file COPYING.MIT or copy at http://opensource.org/licenses/MIT)
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Hashable, List, Tuple
+
+
+# every chosen device costs at least this much, so smaller sets win ties
+DEVICE_COST = 1.0
+# largest number of problems and of dp transitions solved exactly, the dp takes
+# about 10 ms at the work limit when every mask is reachable
+EXACT_PROBLEMS_LIMIT = 16
+EXACT_WORK_LIMIT = 65_536
+
+
+@dataclass
+class DeviceSelection:
+    devices: List[Hashable] = field(default_factory=list)
+    # fixed problem weight minus side-effect penalties of the chosen devices
+    score: float = 0.0
+    cost: float = 0.0
+    # no selection covering the same problems can cost less than this
+    lower_bound: float = 0.0
+    exact: bool = True
+    uncovered: List[Hashable] = field(default_factory=list)
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def select_devices(
+    candidates: Dict[Hashable, Tuple[FrozenSet[Hashable], float]],
+    weights: Dict[Hashable, float],
+) -> DeviceSelection:
+    """Choose devices covering every problem they can fix at the lowest side-effect cost.
+
+    `candidates` maps a device to the problems it fixes and the penalty for the
+    states it causes, `weights` maps a problem to its weight. This is weighted
+    set cover: rooms with few problems are solved exactly with a dp over
+    problem bitmasks, bigger ones greedily with the logarithmic guarantee
+    reported as `lower_bound`.
+    """
+    problems = list(weights)
+    index = {problem: i for i, problem in enumerate(problems)}
+
+    # devices fixing the same problems are interchangeable, keep the cheapest
+    options: Dict[int, Tuple[float, Hashable]] = {}
+    penalties: Dict[Hashable, float] = {}
+    for device, (fixes, penalty) in candidates.items():
+        mask = 0
+        for problem in fixes:
+            i = index.get(problem)
+            if i is not None:
+                mask |= 1 << i
+        if not mask:
+            continue
+        penalties[device] = penalty
+        cost = penalty + DEVICE_COST
+        if mask not in options or cost < options[mask][0]:
+            options[mask] = (cost, device)
+
+    coverable = 0
+    for mask in options:
+        coverable |= mask
+    uncovered = [problem for problem in problems if not coverable >> index[problem] & 1]
+
+    if len(problems) <= EXACT_PROBLEMS_LIMIT and (1 << len(problems)) * len(options) <= EXACT_WORK_LIMIT:
+        devices, cost = _select_exact(options, coverable, len(problems))
+        lower_bound, exact = cost, True
+    else:
+        largest = max((popcount(mask) for mask in options), default=1)
+        devices, cost = _select_greedy(options, coverable)
+        lower_bound, exact = cost / sum(1 / k for k in range(1, largest + 1)), False
+
+    score = sum(weights[problem] for problem in problems if coverable >> index[problem] & 1)
+    score -= sum(penalties[device] for device in devices)
+    return DeviceSelection(devices, score, cost, lower_bound, exact, uncovered)
+
+
+def _select_exact(options: Dict[int, Tuple[float, Hashable]], target: int, size: int) -> Tuple[List[Hashable], float]:
+    inf = float("inf")
+    best = [inf] * (1 << size)
+    parent: List[Tuple[int, Hashable]] = [None] * (1 << size)
+    best[0] = 0.0
+    # every transition only adds bits, so increasing order visits a mask after all its sources
+    for mask in range(1 << size):
+        if best[mask] == inf:
+            continue
+        for option, (cost, device) in options.items():
+            next_mask = mask | option
+            if next_mask != mask and best[mask] + cost < best[next_mask]:
+                best[next_mask] = best[mask] + cost
+                parent[next_mask] = (mask, device)
+
+    devices = []
+    mask = target
+    while mask:
+        mask, device = parent[mask]
+        devices.append(device)
+    devices.reverse()
+    return devices, best[target]
+
+
+def _select_greedy(options: Dict[int, Tuple[float, Hashable]], target: int) -> Tuple[List[Hashable], float]:
+    options = dict(options)
+    chosen = []
+    covered = 0
+    while covered != target:
+        best_option, best_ratio = None, float("inf")
+        for option, (cost, _) in options.items():
+            new = popcount(option & ~covered)
+            if new and cost / new < best_ratio:
+                best_option, best_ratio = option, cost / new
+        chosen.append((best_option, *options.pop(best_option)))
+        covered |= best_option
+
+    # drop devices made redundant by later picks, most expensive first
+    for item in sorted(chosen, key=lambda item: item[1], reverse=True):
+        rest = 0
+        for other in chosen:
+            if other is not item:
+                rest |= other[0]
+        if rest == target:
+            chosen.remove(item)
+    return [device for _, _, device in chosen], sum(cost for _, cost, _ in chosen)
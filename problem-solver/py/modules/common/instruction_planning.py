@@ -0,0 +1,315 @@
+"""
+This source file is part of an OSTIS project. For the latest info, see http://ostis.net
+Distributed under the MIT License
+(See accompanying file COPYING.MIT or copy at http://opensource.org/licenses/MIT)
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from sc_client.models import ScAddr, ScConstruction, ScTemplate
+from sc_client.constants import sc_type
+from sc_client.client import (
+    search_by_template,
+    generate_elements,
+    get_link_content
+)
+
+from .keynodes import keynodes
+from .device_capabilities import device_capabilities
+from .device_selection import select_devices
+from .custom_dataclasses import Problem, RoomPlan
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+
+STATE_RELATIONS = ("nrel_temp_state", "nrel_hum_state", "nrel_co2_state")
+MISSING_DEVIATION = -1000.0
+# problem weight and side-effect penalty per unit, as the agents always scored them
+PROBLEM_WEIGHT = 10
+SIDE_EFFECT_PENALTY = 10
+
+
+class StateSource(ABC):
+    """Where the planner takes room states from and where it puts the instructions."""
+
+    role: str = ""
+    instructions_relation: str = ""
+    # states of the old format keep their deviations only on the shared state classes
+    has_legacy_deviations: bool = False
+
+    @abstractmethod
+    def add_state_owner(self, templ: ScTemplate, state: str) -> None:
+        ...
+
+    @abstractmethod
+    def add_deviation_owner(self, templ: ScTemplate, state: str, deviation: str) -> None:
+        ...
+
+
+class LiveStateSource(StateSource):
+    """States written by the room state detection, instructions for the automation."""
+
+    role = "rrel_current_state"
+    instructions_relation = "nrel_machine_instructions"
+    has_legacy_deviations = True
+
+    def add_state_owner(self, templ: ScTemplate, state: str) -> None:
+        # the current state of a room has no owner, its role is enough
+        pass
+
+    def add_deviation_owner(self, templ: ScTemplate, state: str, deviation: str) -> None:
+        templ.triple(
+            state,
+            sc_type.VAR_PERM_POS_ARC,
+            deviation
+        )
+
+
+class ScenarioStateSource(StateSource):
+    """States a scenario expects in rooms, instructions to reach them."""
+
+    role = "rrel_current_scenario_state"
+    instructions_relation = "nrel_scenario_instructions"
+
+    def __init__(self, scenario: ScAddr):
+        self.scenario = scenario
+
+    def add_state_owner(self, templ: ScTemplate, state: str) -> None:
+        templ.quintuple(
+            self.scenario,
+            sc_type.VAR_PERM_POS_ARC,
+            state,
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.rrel_owner
+        )
+
+    def add_deviation_owner(self, templ: ScTemplate, state: str, deviation: str) -> None:
+        templ.triple(
+            state,
+            sc_type.VAR_PERM_POS_ARC,
+            deviation
+        )
+        templ.quintuple(
+            self.scenario,
+            sc_type.VAR_PERM_POS_ARC,
+            deviation,
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.rrel_owner
+        )
+
+
+class InstructionPlanner:
+    """Plans which devices to turn off and on so that rooms reach normal states.
+
+    Every stage works on all the given rooms at once: states, deviations,
+    devices and enabled devices are each fetched with one search, deviation
+    values with one read, and the instructions of all rooms are generated
+    with one request.
+    """
+
+    def __init__(self, source: StateSource):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.source = source
+
+    def plan(self, rooms: List[ScAddr]) -> List[RoomPlan]:
+        plans = {room: RoomPlan(room) for room in rooms}
+        states = self.get_states(rooms)
+        normal = self.get_normal_states()
+        deviations = self.get_deviations(rooms)
+        if self.source.has_legacy_deviations:
+            missing = {(room, state_class) for room, classes in states.items()
+                       for state_class in classes if state_class not in normal and (room, state_class) not in deviations}
+            if missing:
+                deviations.update(self.get_deviations(rooms, owned=False, keys=missing))
+
+        for room, classes in states.items():
+            plan = plans[room]
+            for state_class in classes:
+                if state_class in normal:
+                    plan.normals.append(state_class)
+                else:
+                    deviation = deviations.get((room, state_class), MISSING_DEVIATION)
+                    plan.problems.append(Problem(state_class, deviation))
+            plan.problems.sort(key=lambda p: abs(p.problem_coefficient), reverse=True)
+
+        problem_plans = [plan for plan in plans.values() if plan.problems]
+        if problem_plans:
+            devices = self.get_devices([plan.room for plan in problem_plans])
+            enabled = self.get_enabled_devices([plan.room for plan in problem_plans])
+            for plan in problem_plans:
+                self.plan_devices(plan, devices.get(plan.room, []), enabled)
+        return [plans[room] for room in rooms]
+
+
+    def plan_devices(self, plan: RoomPlan, devices: List[ScAddr], enabled: Set[ScAddr]) -> None:
+        # enabled devices causing a problem are turned off first
+        problems = plan.problems
+        for device in devices:
+            if not problems:
+                break
+            if device not in enabled:
+                continue
+            causes = device_capabilities.causes(device)
+            remaining = [problem for problem in problems if problem.problem not in causes]
+            if len(remaining) < len(problems):
+                plan.turn_off.append(device)
+            problems = remaining
+        if not problems:
+            self.logger.info("All problems in the room are caused by enabled devices")
+            return
+
+        normals = set(plan.normals)
+        weights = {problem.problem: PROBLEM_WEIGHT * abs(problem.problem_coefficient) for problem in problems}
+        candidates = {}
+        for device in devices:
+            if device in enabled:
+                continue
+            side_effects = sum(1 for state in device_capabilities.causes(device) if state not in normals)
+            candidates[device] = (device_capabilities.fixes(device), SIDE_EFFECT_PENALTY * side_effects)
+
+        selection = select_devices(candidates, weights)
+        plan.turn_on = selection.devices
+        plan.score = selection.score
+        self.logger.info("Devices selected with score %.2f (cost %.1f, lower bound %.1f, %s)",
+                         selection.score, selection.cost, selection.lower_bound, "exact" if selection.exact else "greedy")
+
+
+    def write(self, plans: List[RoomPlan]) -> None:
+        relation = keynodes[self.source.instructions_relation]
+        construction = ScConstruction()
+        for i, plan in enumerate(plans):
+            instructions = f"instructions_{i}"
+            construction.generate_node(sc_type.CONST_NODE, instructions)
+            construction.generate_connector(sc_type.CONST_COMMON_ARC, plan.room, instructions, f"{instructions}_arc")
+            construction.generate_connector(sc_type.CONST_PERM_POS_ARC, relation, f"{instructions}_arc")
+            changes = [(device, keynodes.is_off) for device in plan.turn_off] + [(device, keynodes.is_on) for device in plan.turn_on]
+            for j, (device, device_state) in enumerate(changes):
+                self.add_instruction(construction, instructions, f"{instructions}_{j}", device, device_state)
+        if construction.commands:
+            generate_elements(construction)
+
+
+    def add_instruction(self, construction: ScConstruction, instructions: str, alias: str, device: ScAddr, device_state: ScAddr) -> None:
+        construction.generate_node(sc_type.CONST_NODE, alias)
+        construction.generate_connector(sc_type.CONST_COMMON_ARC, alias, device, f"{alias}_device")
+        construction.generate_connector(sc_type.CONST_PERM_POS_ARC, keynodes.nrel_device, f"{alias}_device")
+        construction.generate_connector(sc_type.CONST_PERM_POS_ARC, alias, device_state, f"{alias}_state")
+        construction.generate_connector(sc_type.CONST_PERM_POS_ARC, keynodes.rrel_change_to_state, f"{alias}_state")
+        construction.generate_connector(sc_type.CONST_PERM_POS_ARC, instructions, alias)
+
+
+    def states_template(self, rooms: List[ScAddr]) -> ScTemplate:
+        templ = ScTemplate()
+        # one room is fixed in the template, several are matched relation-wide and filtered
+        room_param = rooms[0] >> "_room" if len(rooms) == 1 else (sc_type.VAR_NODE, "_room")
+        templ.quintuple(
+            (sc_type.VAR_NODE, "_state"),
+            sc_type.VAR_ACTUAL_TEMP_POS_ARC,
+            room_param,
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes[self.source.role]
+        )
+        self.source.add_state_owner(templ, "_state")
+        templ.quintuple(
+            "_state",
+            sc_type.VAR_COMMON_ARC,
+            (sc_type.VAR_NODE, "_class"),
+            sc_type.VAR_PERM_POS_ARC,
+            (sc_type.VAR_NODE_NON_ROLE, "_relation")
+        )
+        return templ
+
+
+    def get_states(self, rooms: List[ScAddr]) -> Dict[ScAddr, List[ScAddr]]:
+        relations = {keynodes[relation] for relation in STATE_RELATIONS}
+        rooms_set = set(rooms)
+        states = defaultdict(list)
+        for result in search_by_template(self.states_template(rooms)):
+            room = result.get("_room")
+            if room in rooms_set and result.get("_relation") in relations:
+                states[room].append(result.get("_class"))
+        return states
+
+
+    def get_normal_states(self) -> Set[ScAddr]:
+        templ = ScTemplate()
+        templ.triple(
+            keynodes.concept_state_normal,
+            sc_type.VAR_PERM_POS_ARC,
+            (sc_type.VAR_NODE, "_class")
+        )
+        return {result.get("_class") for result in search_by_template(templ)}
+
+
+    def get_deviations(self, rooms: List[ScAddr], owned: bool = True,
+                       keys: Set[Tuple[ScAddr, ScAddr]] = None) -> Dict[Tuple[ScAddr, ScAddr], float]:
+        """Deviations by (room, state class), `owned` by their states unless they are in the old format
+        """
+        relations = {keynodes[relation] for relation in STATE_RELATIONS}
+        rooms_set = set(rooms)
+        templ = self.states_template(rooms)
+        templ.quintuple(
+            "_class",
+            sc_type.VAR_COMMON_ARC,
+            (sc_type.VAR_NODE_LINK, "_deviation"),
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.nrel_deviation
+        )
+        if owned:
+            self.source.add_deviation_owner(templ, "_state", "_deviation")
+        links = {}
+        for result in search_by_template(templ):
+            room = result.get("_room")
+            key = (room, result.get("_class"))
+            if room in rooms_set and result.get("_relation") in relations and (keys is None or key in keys):
+                links.setdefault(key, result.get("_deviation"))
+        if not links:
+            return {}
+        contents = get_link_content(*links.values())
+        return {key: float(content.data) for key, content in zip(links, contents)}
+
+
+    def get_devices(self, rooms: List[ScAddr]) -> Dict[ScAddr, List[ScAddr]]:
+        templ, rooms_set = self.located_template(rooms)
+        templ.triple(
+            keynodes.concept_device,
+            sc_type.VAR_PERM_POS_ARC,
+            "_device"
+        )
+        devices = defaultdict(list)
+        for result in search_by_template(templ):
+            room = result.get("_room")
+            if room in rooms_set:
+                devices[room].append(result.get("_device"))
+        return devices
+
+
+    def get_enabled_devices(self, rooms: List[ScAddr]) -> Set[ScAddr]:
+        templ, rooms_set = self.located_template(rooms)
+        templ.quintuple(
+            "_device",
+            sc_type.VAR_COMMON_ARC,
+            keynodes.is_on,
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.nrel_device_state
+        )
+        return {result.get("_device") for result in search_by_template(templ) if result.get("_room") in rooms_set}
+
+
+    def located_template(self, rooms: List[ScAddr]) -> Tuple[ScTemplate, Set[ScAddr]]:
+        templ = ScTemplate()
+        room_param = rooms[0] >> "_room" if len(rooms) == 1 else (sc_type.VAR_NODE, "_room")
+        templ.quintuple(
+            (sc_type.VAR_NODE, "_device"),
+            sc_type.VAR_PERM_POS_ARC,
+            room_param,
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.rrel_located_at
+        )
+        return templ, set(rooms)
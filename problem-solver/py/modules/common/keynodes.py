@@ -0,0 +1,137 @@
+"""
+This source file is part of an OSTIS project. For the latest info, see http://ostis.net
+Distributed under the MIT License
+(See accompanying file COPYING.MIT or copy at http://opensource.org/licenses/MIT)
+"""
+
+import logging
+import threading
+from typing import Dict, Iterable, Set
+
+from sc_client.models import ScAddr, ScIdtfResolveParams
+from sc_client.constants import sc_type
+from sc_client.constants.sc_type import ScType
+from sc_client.client import resolve_keynodes
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+
+KEYNODE_IDTFS = [
+    # relations
+    "nrel_co2",
+    "nrel_co2_state",
+    "nrel_deviation",
+    "nrel_device",
+    "nrel_device_history",
+    "nrel_device_state",
+    "nrel_final_instructions",
+    "nrel_finish_time",
+    "nrel_hum",
+    "nrel_hum_range",
+    "nrel_hum_state",
+    "nrel_hum_value",
+    "nrel_humidity_range",
+    "nrel_instructions",
+    "nrel_location",
+    "nrel_machine_instructions",
+    "nrel_max",
+    "nrel_min",
+    "nrel_prefs",
+    "nrel_priority",
+    "nrel_readings",
+    "nrel_room",
+    "nrel_rooms",
+    "nrel_scenario_instructions",
+    "nrel_start_time",
+    "nrel_temp",
+    "nrel_temp_range",
+    "nrel_temp_state",
+    "nrel_temp_value",
+    "nrel_timestamp",
+    # roles
+    "rrel_causes_state",
+    "rrel_change_to_state",
+    "rrel_current_measurement",
+    "rrel_current_scenario_state",
+    "rrel_current_state",
+    "rrel_fixes_state",
+    "rrel_is_opposite_to",
+    "rrel_located_at",
+    "rrel_owner",
+    # classes
+    "concept_co2_sensor",
+    "concept_co2_state_high",
+    "concept_co2_state_normal",
+    "concept_device",
+    "concept_hum_state",
+    "concept_hum_state_high",
+    "concept_hum_state_low",
+    "concept_hum_state_normal",
+    "concept_humidity_sensor",
+    "concept_relation",
+    "concept_state",
+    "concept_state_low",
+    "concept_state_normal",
+    "concept_temp_sensor",
+    "concept_temp_state",
+    "concept_temp_state_high",
+    "concept_temp_state_low",
+    "concept_temp_state_normal",
+    "concept_user_preferences",
+    "concept_weather_depended_device",
+    # device states
+    "is_off",
+    "is_on",
+]
+
+
+def keynode_type(idtf: str) -> ScType:
+    if idtf.startswith("nrel_"): return sc_type.CONST_NODE_NON_ROLE
+    if idtf.startswith("rrel_"): return sc_type.CONST_NODE_ROLE
+    if idtf.startswith("concept_"): return sc_type.CONST_NODE_CLASS
+    return sc_type.CONST_NODE
+
+
+class Keynodes:
+    def __init__(self, idtfs: Iterable[str]):
+        self._types: Dict[str, ScType] = {idtf: keynode_type(idtf) for idtf in idtfs}
+        self._addrs: Dict[str, ScAddr] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def resolve_all(self) -> None:
+        idtfs = list(self._types)
+        addrs = resolve_keynodes(*[ScIdtfResolveParams(idtf=idtf, type=self._types[idtf]) for idtf in idtfs])
+        with self._lock:
+            self._addrs = {idtf: addr for idtf, addr in zip(idtfs, addrs) if addr.is_valid()}
+        self.logger.info("Resolved %d keynodes", len(self._addrs))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._addrs = {}
+
+    def addrs(self) -> Set[ScAddr]:
+        return set(self._addrs.values())
+
+    def __getitem__(self, idtf: str) -> ScAddr:
+        addr = self._addrs.get(idtf)
+        if addr is not None:
+            return addr
+        # identifiers built at runtime (e.g. weather states) are resolved on first use
+        type = self._types.setdefault(idtf, keynode_type(idtf))
+        addr = resolve_keynodes(ScIdtfResolveParams(idtf=idtf, type=type))[0]
+        if addr.is_valid():
+            with self._lock:
+                self._addrs[idtf] = addr
+        return addr
+
+    def __getattr__(self, idtf: str) -> ScAddr:
+        if idtf.startswith("_"):
+            raise AttributeError(idtf)
+        return self[idtf]
+
+
+keynodes = Keynodes(KEYNODE_IDTFS)
@@ -0,0 +1,67 @@
+"""
+This source file is part of an OSTIS project. For the latest info, see http://ostis.net
+Distributed under the MIT License
+(See accompanying file COPYING.MIT or copy at http://opensource.org/licenses/MIT)
+"""
+
+import logging
+import threading
+from typing import Iterable, List, Set
+
+from sc_client.models import ScAddr, ScTemplateResult
+from sc_client.client import erase_elements, get_elements_types
+
+from .keynodes import keynodes
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+
+# classes and relations met while collecting, they are never erased
+_protected: Set[ScAddr] = set()
+_protected_lock = threading.Lock()
+
+
+class StructureCollector:
+    """Collects elements of superseded structures and erases them at once.
+
+    Keynodes, classes and relations that slip into the collected elements (for
+    example through a template result) are filtered out: known ones against a
+    cached set, unknown ones by their types fetched with a single request.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._elements: List[ScAddr] = []
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    def add(self, *addrs: ScAddr) -> None:
+        self._elements.extend(addrs)
+
+    def add_results(self, results: Iterable[ScTemplateResult], *aliases: str) -> None:
+        for result in results:
+            for alias in aliases:
+                self._elements.append(result.get(alias))
+
+    def erase(self) -> int:
+        protected = keynodes.addrs() | _protected
+        candidates = [addr for addr in dict.fromkeys(self._elements) if addr.is_valid() and addr not in protected]
+        self._elements = []
+        if not candidates:
+            return 0
+
+        elements = []
+        for addr, addr_type in zip(candidates, get_elements_types(*candidates)):
+            if addr_type.is_class() or addr_type.is_role() or addr_type.is_non_role():
+                with _protected_lock:
+                    _protected.add(addr)
+            elif addr_type.is_valid():
+                elements.append(addr)
+        if elements:
+            erase_elements(*elements)
+        self.logger.debug("Erased %d elements", len(elements))
+        return len(elements)
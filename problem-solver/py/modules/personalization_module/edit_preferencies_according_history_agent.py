@@ -23,7 +23,7 @@ from sc_kpm.utils.action_utils import (
     generate_action_result
 )
 
-from sc_kpm import ScKeynodes
+from ..common.keynodes import keynodes
 
 
 from datetime import datetime
@@ -52,12 +52,12 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
         temp_values, hum_values = self.get_history(user, device)
         temp_diapazone_size, hum_diapazone_size = self.get_diapazone_size(user)
         states = self.get_fixing_state(device)
-        temp_state = self.has_relation_to(states, ScKeynodes.resolve("concept_temp_state", sc_type.VAR_NODE_CLASS))
+        temp_state = self.has_relation_to(states, keynodes.concept_temp_state)
         if temp_state != ScAddr(0):
-            self.solve(user, temp_values, temp_diapazone_size, temp_state, ScKeynodes.resolve("nrel_temp_range", sc_type.CONST_NODE_NON_ROLE))
-        hum_state = self.has_relation_to(states, ScKeynodes.resolve("concept_hum_state", sc_type.VAR_NODE_CLASS))
+            self.solve(user, temp_values, temp_diapazone_size, temp_state, keynodes.nrel_temp_range)
+        hum_state = self.has_relation_to(states, keynodes.concept_hum_state)
         if hum_state != ScAddr(0):
-            self.solve(user, hum_values, hum_diapazone_size, hum_state, ScKeynodes.resolve("nrel_hum_range", sc_type.CONST_NODE_NON_ROLE))
+            self.solve(user, hum_values, hum_diapazone_size, hum_state, keynodes.nrel_hum_range)
         
 
 
@@ -71,7 +71,7 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
             sc_type.VAR_PERM_POS_ARC,
             (sc_type.VAR_NODE, "_room"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_located_at", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_located_at
         )
         search_results = search_by_template(templ)
         if not search_results: return ScAddr(0)
@@ -85,7 +85,7 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_set"), 
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_device_history", sc_type.CONST_NODE_ROLE)
+            keynodes.nrel_device_history
         )
         templ.triple(
             "_set",
@@ -97,21 +97,21 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             device,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_device", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_device
         )
         templ.quintuple(
             "_element",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_temp_link"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp_value", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_temp_value
         )
         templ.quintuple(
             "_element",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_hum_link"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum_value", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_hum_value
         )
 
         search_result = search_by_template(templ)
@@ -132,10 +132,10 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_prefs"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_prefs", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_prefs
         )
         templ.triple(
-            ScKeynodes.resolve("concept_user_preferences", sc_type.VAR_NODE_CLASS),
+            keynodes.concept_user_preferences,
             sc_type.VAR_PERM_POS_ARC,
             "_prefs"
         )
@@ -144,42 +144,42 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_temp_range"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp_range", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_temp_range
         )
         templ.quintuple(
             "_temp_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_temp_min"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_min", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_min
         )
         templ.quintuple(
             "_temp_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_temp_max"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_max", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_max
         )
         templ.quintuple(
             "_prefs",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_hum_range"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum_range", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_hum_range
         )
         templ.quintuple(
             "_hum_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_hum_min"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_min", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_min
         )
         templ.quintuple(
             "_hum_range",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_hum_max"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_max", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_max
         )
 
         search_result = search_by_template(templ)
@@ -200,7 +200,7 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
             sc_type.VAR_PERM_POS_ARC,
             (sc_type.VAR_NODE_CLASS, "_state"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_fixes_state", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_fixes_state
         )
         search_results = search_by_template(templ)
         states = []
@@ -228,7 +228,7 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
         def is_less(state_: ScAddr) -> bool:
             templ = ScTemplate()
             templ.triple(
-                ScKeynodes.resolve("concept_state_low", sc_type.VAR_NODE_CLASS),
+                keynodes.concept_state_low,
                 sc_type.VAR_PERM_POS_ARC,
                 state_
             )
@@ -249,10 +249,10 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
                 sc_type.VAR_COMMON_ARC,
                 (sc_type.VAR_NODE, "_prefs"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("nrel_prefs", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.nrel_prefs
             )
             templ.triple(
-                ScKeynodes.resolve("concept_user_preferences", sc_type.VAR_NODE_CLASS),
+                keynodes.concept_user_preferences,
                 sc_type.VAR_PERM_POS_ARC,
                 "_prefs"
             )
@@ -274,14 +274,14 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
             (sc_type.VAR_COMMON_ARC, "_arc2"),
             (sc_type.VAR_NODE_LINK, "_min"),
             (sc_type.VAR_PERM_POS_ARC, "_arc1"),
-            ScKeynodes.resolve("nrel_min", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_min
         )
         templ.quintuple(
             "_range",
             (sc_type.VAR_COMMON_ARC, "_arc4"),
             (sc_type.VAR_NODE_LINK, "_max"),
             (sc_type.VAR_PERM_POS_ARC, "_arc3"),
-            ScKeynodes.resolve("nrel_max", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_max
         )
         search_results = search_by_template(templ)
         if not search_results: 
@@ -313,14 +313,14 @@ class EditPreferenciesAccodingHistoryAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             min_link,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_min", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_min
         )
         templ.quintuple(
             range,
             sc_type.VAR_COMMON_ARC, 
             max_link,
             sc_type.VAR_PERM_POS_ARC, 
-            ScKeynodes.resolve("nrel_max", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_max
         )
         generate_by_template(templ)
         return None
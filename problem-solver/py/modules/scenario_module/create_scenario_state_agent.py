@@ -12,8 +12,7 @@ from sc_client.constants import sc_type
 from sc_client.client import (
     search_by_template,
     generate_by_template, 
-    generate_elements,
-    erase_elements
+    generate_elements
 )
 
 from sc_kpm import ScAgentClassic, ScResult
@@ -28,13 +27,14 @@ from sc_kpm.utils.action_utils import (
     generate_action_result
 )
 
-from sc_kpm import ScKeynodes
+from ..common.keynodes import keynodes
+from ..common.structure_gc import StructureCollector
 
 
 from datetime import datetime, timezone, time
 from typing import Optional
 
-from .additions import (
+from ..common.additions import (
     get_interval
 )
 
@@ -66,14 +66,14 @@ class CreateScenarioStateAgent(ScAgentClassic):
         print(len(instructions))
         for instruction in instructions:
             room, temp, hum = instruction
-            temp_dev = abs(self.get_measurement(room, ScKeynodes.resolve("nrel_temp", sc_type.CONST_NODE_NON_ROLE)) - temp) / temp
-            hum_dev = abs(self.get_measurement(room, ScKeynodes.resolve("nrel_hum", sc_type.CONST_NODE_NON_ROLE)) - hum) / hum
+            temp_dev = abs(self.get_measurement(room, keynodes.nrel_temp) - temp) / temp
+            hum_dev = abs(self.get_measurement(room, keynodes.nrel_hum) - hum) / hum
             co2_dev = 0.0
-            co2 = self.get_measurement(room, ScKeynodes.resolve("nrel_co2", sc_type.CONST_NODE_NON_ROLE))
+            co2 = self.get_measurement(room, keynodes.nrel_co2)
             if co2 > 800: co2_dev = (co2 - 800) / 700
 
             temp_state, hum_state, co2_state = self.get_state(room=room, temp=[temp - 0.5, temp + 0.5], hum=[hum - 1.0, hum + 1.0])
-            self.delete_previous_state(scenario, room)
+            self.delete_previous_state(room, scenario)
             self.set_new_state(scenario, room, temp_state, hum_state, co2_state, temp_dev, hum_dev, co2_dev)
 
         
@@ -134,14 +134,14 @@ class CreateScenarioStateAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_start_link"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_start_time", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_start_time
         )
         templ.quintuple(
             scenario,
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_finish_link"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_finish_time", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_finish_time
         )
         
         search_results = search_by_template(templ)
@@ -174,7 +174,7 @@ class CreateScenarioStateAgent(ScAgentClassic):
             sc_type.VAR_ACTUAL_TEMP_POS_ARC,
             room,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_current_measurement", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_current_measurement
         )
         templ.quintuple(
             "_measurement",
@@ -195,7 +195,7 @@ class CreateScenarioStateAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_set"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_instructions", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_instructions
         )
         templ.triple(
             "_set",
@@ -212,21 +212,21 @@ class CreateScenarioStateAgent(ScAgentClassic):
                 sc_type.VAR_COMMON_ARC,
                 (sc_type.VAR_NODE_LINK, "_temp_link"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("nrel_temp", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.nrel_temp
             )
             templ.quintuple(
                 element,
                 sc_type.VAR_COMMON_ARC,
                 (sc_type.VAR_NODE_LINK, "_hum_link"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("nrel_hum", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.nrel_hum
             )
             templ.quintuple(
                 element,
                 sc_type.VAR_COMMON_ARC,
                 (sc_type.VAR_NODE, "_room"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("nrel_room", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.nrel_room
             )
             search_results = search_by_template(templ)
             temp = float(get_link_content_data(search_results[0].get("_temp_link")))
@@ -244,126 +244,89 @@ class CreateScenarioStateAgent(ScAgentClassic):
             sc_type.VAR_ACTUAL_TEMP_POS_ARC,
             room,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_current_measurement", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_current_measurement
         )
         templ.quintuple(
             "_measurement",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_temp_link"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_temp
         )
         templ.quintuple(
             "_measurement",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_hum_link"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_hum
         )
         templ.quintuple(
             "_measurement",
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE_LINK, "_co2_link"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_co2", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_co2
         )
         search_results = search_by_template(templ)
         co2_state = ScAddr(0)
-        if float(get_link_content_data(search_results[0].get("_co2_link"))) <= 800: co2_state = ScKeynodes.resolve("concept_co2_state_normal", sc_type.CONST_NODE_CLASS)
-        else: co2_state = ScKeynodes.resolve("concept_co2_state_high", sc_type.CONST_NODE_CLASS)
-        return ScKeynodes.resolve(f"concept_temp_state_{get_interval(l=temp[0], r=temp[1], value=float(get_link_content_data(search_results[0].get("_temp_link"))))}", sc_type.CONST_NODE_CLASS), ScKeynodes.resolve(f"concept_hum_state_{get_interval(l=hum[0], r=hum[1], value=float(get_link_content_data(search_results[0].get("_hum_link"))))}", sc_type.CONST_NODE_CLASS), co2_state
+        if float(get_link_content_data(search_results[0].get("_co2_link"))) <= 800: co2_state = keynodes.concept_co2_state_normal
+        else: co2_state = keynodes.concept_co2_state_high
+        temp_interval = get_interval(l=temp[0], r=temp[1], value=float(get_link_content_data(search_results[0].get("_temp_link"))))
+        hum_interval = get_interval(l=hum[0], r=hum[1], value=float(get_link_content_data(search_results[0].get("_hum_link"))))
+        return keynodes[f"concept_temp_state_{temp_interval}"], keynodes[f"concept_hum_state_{hum_interval}"], co2_state
 
 
     def delete_previous_state(self, room: ScAddr, scenario: ScAddr) -> None:
-        def is_relation(node: ScAddr) -> bool:
-            templ = ScTemplate()
-            templ.triple(
-                ScKeynodes.resolve("concept_relation", sc_type.CONST_NODE_CLASS),
-                sc_type.VAR_PERM_POS_ARC,
-                node
-            )
-            search_results = search_by_template(templ)
-            if not search_results: return False
-            else: return True
-
-        def is_state(node: ScAddr) -> bool:
-            templ = ScTemplate()
-            templ.triple(
-                ScKeynodes.resolve("concept_state", sc_type.CONST_NODE_CLASS),
-                sc_type.VAR_PERM_POS_ARC,
-                node
-            )
-            search_results = search_by_template(templ)
-            if not search_results: return False
-            else: return True
-
-
         templ = ScTemplate()
         templ.quintuple(
             (sc_type.VAR_NODE, "_state"),
             sc_type.VAR_ACTUAL_TEMP_POS_ARC,
             room,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_current_scenario_state", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_current_scenario_state
         )
         templ.quintuple(
             scenario,
             sc_type.VAR_PERM_POS_ARC,
             "_state",
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_owner", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_owner
         )
+        states = search_by_template(templ)
+        if not states:
+            return None
+        collector = StructureCollector()
+        collector.add_results(states, "_state")
+
         templ.quintuple(
             "_state",
             sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE, "_temp_state"),
+            (sc_type.VAR_NODE_CLASS, "_class"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp_state", sc_type.CONST_NODE_NON_ROLE)
+            (sc_type.VAR_NODE_NON_ROLE, "_relation")
         )
         templ.quintuple(
-            "_state",
+            "_class",
             sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE, "_hum_state"),
+            (sc_type.VAR_NODE_LINK, "_deviation"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum_state", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_deviation
         )
-        templ.quintuple(
+        # deviation links hang off the shared state classes, only the ones of this state are erased
+        templ.triple(
             "_state",
-            sc_type.VAR_COMMON_ARC,
-            (sc_type.VAR_NODE, "_co2_state"),
-            sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_co2_state", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_co2_state",
-            sc_type.VAR_COMMON_ARC,
-            sc_type.VAR_NODE_LINK,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
+            "_deviation"
         )
         templ.quintuple(
-            "_hum_state",
-            sc_type.VAR_COMMON_ARC,
-            sc_type.VAR_NODE_LINK,
+            scenario,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
-        )
-        templ.quintuple(
-            "_temp_state",
-            sc_type.VAR_COMMON_ARC,
-            sc_type.VAR_NODE_LINK,
+            "_deviation",
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.rrel_owner
         )
-
-
-        search_results = search_by_template(templ)
-        if not search_results:
-            return None
-        for i in range(len(search_results)):
-            element = search_results[0].get(i)
-            if element != room and not is_relation(element) and not is_state(element): erase_elements(element)
-        
+        collector.add_results(search_by_template(templ), "_deviation")
+        collector.erase()
         return None
     
 
@@ -387,77 +350,84 @@ class CreateScenarioStateAgent(ScAgentClassic):
             sc_type.VAR_ACTUAL_TEMP_POS_ARC,
             room,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_current_scenario_state", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_current_scenario_state
         )
         templ.quintuple(
             scenario,
             sc_type.VAR_PERM_POS_ARC,
             "_state",
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_owner", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_owner
         )
         templ.quintuple(
             "_state",
             sc_type.VAR_COMMON_ARC,
             temp_state,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_temp_state", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_temp_state
         )
         templ.quintuple(
             "_state",
             sc_type.VAR_COMMON_ARC,
             hum_state,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_hum_state", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_hum_state
         )
         templ.quintuple(
             "_state",
             sc_type.VAR_COMMON_ARC,
             co2_state,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_co2_state", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_co2_state
         )
         templ.quintuple(
             temp_state,
             sc_type.VAR_COMMON_ARC,
             temp_link,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_deviation
         )
         templ.quintuple(
             hum_state,
             sc_type.VAR_COMMON_ARC,
             hum_link,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_deviation
         )
         templ.quintuple(
             co2_state,
             sc_type.VAR_COMMON_ARC,
             co2_link,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_deviation", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_deviation
         )
         templ.quintuple(
             scenario,
             sc_type.VAR_PERM_POS_ARC,
             hum_link,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_owner", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_owner
         )
         templ.quintuple(
             scenario,
             sc_type.VAR_PERM_POS_ARC,
             temp_link,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_owner", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_owner
         )
         templ.quintuple(
             scenario,
             sc_type.VAR_PERM_POS_ARC,
             co2_link,
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_owner", sc_type.CONST_NODE_ROLE)
+            keynodes.rrel_owner
         )
+        # the state owns its deviation links so they can be found and erased with it
+        for link in (temp_link, hum_link, co2_link):
+            templ.triple(
+                "_state",
+                sc_type.VAR_PERM_POS_ARC,
+                link
+            )
 
         generate_by_template(templ)
\ No newline at end of file
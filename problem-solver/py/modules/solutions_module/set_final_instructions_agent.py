@@ -12,8 +12,7 @@ from sc_client.constants import sc_type
 from sc_client.client import (
     search_by_template,
     generate_by_template, 
-    generate_elements,
-    erase_elements
+    generate_elements
 )
 
 from sc_kpm.sc_sets import ScSet
@@ -32,7 +31,8 @@ from sc_kpm.utils.action_utils import (
     generate_action_result
 )
 
-from sc_kpm import ScKeynodes
+from ..common.keynodes import keynodes
+from ..common.structure_gc import StructureCollector
 
 
 
@@ -79,7 +79,7 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_set"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_machine_instructions", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_machine_instructions
         )
         templ.triple(
             "_set",
@@ -91,14 +91,14 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_device"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_device", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_device
         )
         templ.quintuple(
             "_instruction",
             sc_type.VAR_PERM_POS_ARC,
             (sc_type.VAR_NODE, "_state"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("rrel_change_to_state", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.rrel_change_to_state
         )
         search_results = search_by_template(templ)
         instructions = []
@@ -113,14 +113,14 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
             to_off_count = 0
             to_on = 0
             to_on_count = 0
-            is_on_node = ScKeynodes.resolve("is_on", sc_type.VAR_NODE)
+            is_on_node = keynodes.is_on
             templ = ScTemplate()
             templ.quintuple(
                 room,
                 sc_type.VAR_COMMON_ARC,
                 (sc_type.VAR_NODE, "_set"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("nrel_scenario_instructions", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.nrel_scenario_instructions
             )
             templ.triple(
                 "_set",
@@ -132,28 +132,28 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
                 sc_type.VAR_COMMON_ARC,
                 device,
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("nrel_device", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.nrel_device
             )
             templ.quintuple(
                 "_instruction",
                 sc_type.VAR_PERM_POS_ARC,
                 (sc_type.VAR_NODE, "_state"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("rrel_change_to_state", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.rrel_change_to_state
             )
             templ.quintuple(
                 (sc_type.VAR_NODE, "_scenario"),
                 sc_type.VAR_PERM_POS_ARC,
                 "_set",
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("rrel_owner", sc_type.CONST_NODE_ROLE)
+                keynodes.rrel_owner
             )
             templ.quintuple(
                 "_scenario",
                 sc_type.VAR_COMMON_ARC,
                 (sc_type.VAR_NODE_LINK, "_link"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("nrel_priority", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.nrel_priority
             )
             search_results = search_by_template(templ)
             scenario_was = []
@@ -175,10 +175,10 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
             print(to_off_count)
             print(to_on_count)
 
-            if to_on_count == 0: return ScKeynodes.resolve("is_off", sc_type.VAR_NODE)
+            if to_on_count == 0: return keynodes.is_off
             if to_off_count == 0: return is_on_node
             if to_on / to_on_count > to_off / to_off_count: return is_on_node
-            return ScKeynodes.resolve("is_off", sc_type.VAR_NODE)
+            return keynodes.is_off
 
 
 
@@ -190,7 +190,7 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_set"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_scenario_instructions", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_scenario_instructions
         )
         search_results = search_by_template(templ)
         if not search_results: return []
@@ -208,14 +208,14 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
                 sc_type.VAR_COMMON_ARC,
                 (sc_type.VAR_NODE, "_device"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("nrel_device", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.nrel_device
             )
             templ.quintuple(
                 "_instruction",
                 sc_type.VAR_PERM_POS_ARC,
                 (sc_type.VAR_NODE, "_state"),
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("rrel_change_to_state", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.rrel_change_to_state
             )
             another_search_results = search_by_template(templ)
             if not another_search_results: continue
@@ -244,45 +244,31 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
         templ = ScTemplate()
         templ.quintuple(
             room,
-            (sc_type.VAR_COMMON_ARC, "_arc2"),
+            sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_set"),
-            (sc_type.VAR_PERM_POS_ARC, "_arc1"),
-            ScKeynodes.resolve("nrel_final_instructions", sc_type.CONST_NODE_NON_ROLE)
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.nrel_final_instructions
         )
         search_results = search_by_template(templ)
         if not search_results: return None
-        set_node = search_results[0].get("_set")
-        arc1 = search_results[0].get("_arc1")
-        arc2 = search_results[0].get("_arc2")
-        erase_elements(arc1, arc2)
-        templ = ScTemplate()
+        collector = StructureCollector()
+        collector.add_results(search_results, "_set")
+
         templ.triple(
-            set_node,
-            (sc_type.VAR_PERM_POS_ARC, "_arc1"),
-            "_instruction"
-        )
-        templ.quintuple(
-            "_instruction",
-            (sc_type.VAR_PERM_POS_ARC, "_arc3"),
-            sc_type.VAR_NODE,
-            (sc_type.VAR_PERM_POS_ARC, "_arc2"),
-            ScKeynodes.resolve("rrel_change_to_state", sc_type.CONST_NODE_ROLE)
+            "_set",
+            sc_type.VAR_PERM_POS_ARC,
+            (sc_type.VAR_NODE, "_instruction")
         )
         templ.quintuple(
             "_instruction",
-            (sc_type.VAR_COMMON_ARC, "_arc5"),
+            sc_type.VAR_COMMON_ARC,
             sc_type.VAR_NODE,
-            (sc_type.VAR_PERM_POS_ARC, "_arc4"),
-            ScKeynodes.resolve("nrel_device", sc_type.CONST_NODE_NON_ROLE)
+            sc_type.VAR_PERM_POS_ARC,
+            keynodes.nrel_device
         )
-        search_results = search_by_template(templ)
-        for result in search_results:
-            for i in range(1, 6):
-                erase_elements(result.get(f"_arc{i}"))
-            erase_elements(
-                search_results[0].get("_instruction")
-            )
-        erase_elements(set_node)
+        # connectors go away together with the set and instruction nodes
+        collector.add_results(search_by_template(templ), "_instruction")
+        collector.erase()
         return None
 
 
@@ -293,7 +279,7 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
             sc_type.VAR_COMMON_ARC,
             (sc_type.VAR_NODE, "_set"),
             sc_type.VAR_PERM_POS_ARC,
-            ScKeynodes.resolve("nrel_final_instructions", sc_type.CONST_NODE_NON_ROLE)
+            keynodes.nrel_final_instructions
         )
         generation_result = generate_by_template(templ)
         set_node = generation_result.get("_set")
@@ -309,14 +295,14 @@ class CreateFinalInstructionsAgent(ScAgentClassic):
                 sc_type.VAR_PERM_POS_ARC,
                 instructions[device],
                 sc_type.VAR_PERM_POS_ARC, 
-                ScKeynodes.resolve("rrel_change_to_state", sc_type.CONST_NODE_ROLE)
+                keynodes.rrel_change_to_state
             )
             templ.quintuple(
                 "_instruction",
                 sc_type.VAR_COMMON_ARC, 
                 device,
                 sc_type.VAR_PERM_POS_ARC,
-                ScKeynodes.resolve("nrel_device", sc_type.CONST_NODE_NON_ROLE)
+                keynodes.nrel_device
             )
 
             generate_by_template(templ)
@@ -5,8 +5,14 @@ Distributed under the MIT License
 """
 
 import argparse
+from sc_client import client
 from sc_kpm import ScServer
+from modules.common.keynodes import keynodes
+from modules.common.device_capabilities import device_capabilities
 from modules.automation_module.automation_module import AutomationModule
+from modules.automation_module.sensor_ingestion import SensorIngestion, sensor_store
+from modules.automation_module.weather_providers import (
+    CachedWeatherProvider, OwmWeatherProvider, ReplayWeatherProvider, WeatherProvider, PYOWM_TOKEN)
 from modules.scenario_module.scenario_module import ScenarioModule
 from modules.solutions_module.solutions_module import SolutionsModule
 from modules.personalization_module.personalization_module import PersonalizationModule
@@ -14,19 +20,50 @@ from modules.personalization_module.personalization_module import Personalizatio
 SC_SERVER_PROTOCOL = "protocol"
 SC_SERVER_HOST = "host"
 SC_SERVER_PORT = "port"
+SENSOR_SOURCE = "sensor_source"
+SENSOR_WINDOW = "sensor_window"
+SENSOR_THRESHOLD = "sensor_threshold"
+WEATHER_TTL = "weather_ttl"
+OWM_TOKEN = "owm_token"
+WEATHER_REPLAY = "weather_replay"
+WEATHER_REPLAY_SPEED = "weather_replay_speed"
 
 SC_SERVER_PROTOCOL_DEFAULT = "ws"
 SC_SERVER_HOST_DEFAULT = "localhost"
 SC_SERVER_PORT_DEFAULT = "8090"
+SENSOR_WINDOW_DEFAULT = 60
+SENSOR_THRESHOLD_DEFAULT = 0.1
+WEATHER_TTL_DEFAULT = 600.0
+WEATHER_REPLAY_SPEED_DEFAULT = 1.0
+
+
+def on_reconnect() -> None:
+    keynodes.invalidate()
+    keynodes.resolve_all()
+    device_capabilities.subscribe()
+
+
+def create_weather_provider(args: dict) -> WeatherProvider:
+    if args[WEATHER_REPLAY]:
+        return ReplayWeatherProvider(args[WEATHER_REPLAY], args[WEATHER_REPLAY_SPEED])
+    return CachedWeatherProvider(OwmWeatherProvider(args[OWM_TOKEN]), args[WEATHER_TTL])
 
 
 def main(args: dict):
     server = ScServer(
         f"{args[SC_SERVER_PROTOCOL]}://{args[SC_SERVER_HOST]}:{args[SC_SERVER_PORT]}")
 
+    weather_provider = create_weather_provider(args)
+
+    client.set_reconnect_handler(post_reconnect_handler=on_reconnect)
     with server.connect():
+        keynodes.resolve_all()
+        device_capabilities.subscribe()
+        if args[SENSOR_SOURCE]:
+            sensor_store.window_size = args[SENSOR_WINDOW]
+            SensorIngestion(args[SENSOR_SOURCE], sensor_store, args[SENSOR_THRESHOLD]).start()
         modules = [
-            AutomationModule(),
+            AutomationModule(weather_provider),
             ScenarioModule(),
             SolutionsModule(),
             PersonalizationModule()
@@ -44,6 +81,26 @@ if __name__ == '__main__':
         '--host', type=str, dest=SC_SERVER_HOST, default=SC_SERVER_HOST_DEFAULT, help="sc-server host")
     parser.add_argument(
         '--port', type=int, dest=SC_SERVER_PORT, default=SC_SERVER_PORT_DEFAULT, help="sc-server port")
+    parser.add_argument(
+        '--sensor-source', type=str, dest=SENSOR_SOURCE, default=None,
+        help="pushed sensor readings source: udp://host:port or a file to follow")
+    parser.add_argument(
+        '--sensor-window', type=int, dest=SENSOR_WINDOW, default=SENSOR_WINDOW_DEFAULT,
+        help="number of latest readings aggregated per sensor")
+    parser.add_argument(
+        '--sensor-threshold', type=float, dest=SENSOR_THRESHOLD, default=SENSOR_THRESHOLD_DEFAULT,
+        help="minimal change of a sensor mean written to the knowledge base")
+    parser.add_argument(
+        '--weather-ttl', type=float, dest=WEATHER_TTL, default=WEATHER_TTL_DEFAULT,
+        help="seconds a weather observation is reused for the same location")
+    parser.add_argument(
+        '--owm-token', type=str, dest=OWM_TOKEN, default=PYOWM_TOKEN, help="OpenWeatherMap API token")
+    parser.add_argument(
+        '--weather-replay', type=str, dest=WEATHER_REPLAY, default=None,
+        help="CSV or JSONL file with recorded weather observations to replay instead of OpenWeatherMap")
+    parser.add_argument(
+        '--weather-replay-speed', type=float, dest=WEATHER_REPLAY_SPEED, default=WEATHER_REPLAY_SPEED_DEFAULT,
+        help="replay speed factor, 0 returns the next record on every request")
     args = parser.parse_args()
 
     main(vars(args))